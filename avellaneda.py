@@ -0,0 +1,31 @@
+import numpy as np
+
+
+# Avellaneda–Stoikov quotes for many ticks at once, the same maths as Trader.deploy_AS.
+# All inputs are NumPy arrays (or scalars) that broadcast together, e.g. a whole day of
+# mid prices against one gamma, or a (gamma, 1) column against a (1, ticks) row to build a quote surface.
+# kappa must be positive, as in deploy_AS.
+# Returns bid price, ask price, bid volume and ask volume arrays (volumes are positive).
+def quote_batch(s, sigma, t, gamma, kappa, q, position_limit, T=1):
+    s = np.asarray(s, dtype=np.float64)
+    sigma = np.asarray(sigma, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    gamma = np.asarray(gamma, dtype=np.float64)
+    kappa = np.asarray(kappa, dtype=np.float64)
+    q = np.asarray(q)
+
+    # Reservation Price (same operation order as deploy_AS so the rounding matches)
+    r = s - q * gamma * sigma * sigma * (T - t)
+
+    # Optimal bid/ask spread
+    delta = (gamma * sigma * sigma * (T - t) + 2 * np.log(1 + gamma / kappa) / gamma) / 2
+
+    # Trade Price, int() in deploy_AS truncates toward zero
+    bid_price = np.trunc(r - delta).astype(np.int64)
+    ask_price = np.trunc(r + delta).astype(np.int64)
+
+    # Trade Volumn
+    bid_volume = position_limit - q
+    ask_volume = q + position_limit
+
+    return bid_price, ask_price, bid_volume, ask_volume
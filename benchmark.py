@@ -0,0 +1,287 @@
+from datamodel import Order
+from data_loader import load_prices, load_trades, parse_prices, parse_trades
+from matching import MatchingEngine
+from replay import iter_snapshots, replay
+from run_data import day_files, run_backtest, run_backtests
+from trader import Trader, encode_state, decode_state
+from trade_logger import TradeLogger
+import argparse
+import json
+import os
+import tempfile
+import random
+import subprocess
+import sys
+import time
+import jsonpickle
+
+days = [-2, -1, 0]
+
+
+# (prices, trades) of one day, from the binary cache after the first load
+def load_day(day: int):
+    price_path, trade_path = day_files(day)
+    return load_prices(price_path), load_trades(trade_path)
+
+
+# CSV parse throughput over all day files, and the time to open them again from the binary cache
+def bench_loader(repeat: int = 3):
+    rows = 0
+    for day in days:
+        price_path, trade_path = day_files(day)
+        rows += len(parse_prices(price_path)) + len(parse_trades(trade_path))
+        load_day(day)
+
+    def parse_all():
+        for day in days:
+            price_path, trade_path = day_files(day)
+            parse_prices(price_path)
+            parse_trades(trade_path)
+
+    def load_all():
+        for day in days:
+            load_day(day)
+
+    return {
+        "loader_parse_rows_per_s": rows / time_call(parse_all, 1, repeat),
+        "loader_cached_load_s": time_call(load_all, 10, repeat),
+    }
+
+
+# Trader.run calls per second on the day 0 states, without matching
+def bench_trader_run(repeat: int = 3):
+    states = list(replay([load_day(0)]))
+    best = None
+    for _ in range(repeat):
+        trader = Trader()
+        trader_data = ""
+        start = time.perf_counter()
+        for state in states:
+            state.traderData = trader_data
+            _, _, trader_data = trader.run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {"trader_run_calls_per_s": len(states) / best}
+
+
+# End to end: open day 0 from the cache, replay it through Trader and the matching engine.
+# Also four traders driven from the same single pass.
+def bench_replay(repeat: int = 3):
+    def replay_day():
+        run_backtest(Trader(), replay([load_day(0)]))
+
+    def replay_day_4():
+        run_backtests([Trader() for _ in range(4)], replay([load_day(0)]))
+
+    return {"replay_day_s": time_call(replay_day, 1, repeat), "replay_day_4_traders_s": time_call(replay_day_4, 1, repeat)}
+
+
+# Order-match operations per second of MatchingEngine on the day 0 books.
+# Every tick loads the book and matches a crossing buy, a crossing sell and two passive quotes per product.
+def bench_matching(repeat: int = 5):
+    prices = load_prices(day_files(0)[0])
+    ticks = []
+    for timestamp, order_depths in iter_snapshots(prices):
+        orders = []
+        for product, order_depth in order_depths.items():
+            best_bid = max(order_depth.buy_orders)
+            best_ask = min(order_depth.sell_orders)
+            orders.append(Order(product, best_ask + 1, 5))
+            orders.append(Order(product, best_bid - 1, -5))
+            orders.append(Order(product, best_bid - 2, 5))
+            orders.append(Order(product, best_ask + 2, -5))
+        ticks.append((timestamp, order_depths, orders))
+
+    operations = sum(len(orders) for _, _, orders in ticks)
+    best = None
+    for _ in range(repeat):
+        engine = MatchingEngine()
+        start = time.perf_counter()
+        for timestamp, order_depths, orders in ticks:
+            engine.load(order_depths, timestamp)
+            match = engine.match
+            for order in orders:
+                match(order)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {"matching_ops_per_s": operations / best}
+
+
+# Best time of `repeat` rounds of `number` calls to fn, per call
+def time_call(fn, number: int, repeat: int = 5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# traderData encode/decode time and size against jsonpickle as the stored history grows.
+# History is the number of ratios kept per product by a "window" volatility estimator.
+def bench_state_codec(histories=(10, 100, 1000, 10000)):
+    results = {}
+    rng = random.Random(0)
+
+    for history in histories:
+        trader = Trader()
+        trader.volatility_mode = "window"
+        trader.volatility_window = history
+        for product in trader.last_avg_trade_price:
+            trader.last_avg_trade_price[product] = 1000 * rng.random()
+            estimator = trader.volatility_estimator(product)
+            for _ in range(history):
+                estimator.update(1 + rng.gauss(0, 1e-3))
+
+        rolling_state = {
+            "volatility": trader.volatility,
+            "last_avg_trade_price": trader.last_avg_trade_price,
+            "last_timestamp": trader.last_timestamp,
+        }
+        data = encode_state(trader)
+        pickled = jsonpickle.encode(rolling_state)
+        number = max(10, 10000 // history)
+
+        results["codec_encode_us_" + str(history)] = time_call(lambda: encode_state(trader), number) * 1e6
+        results["codec_decode_us_" + str(history)] = time_call(lambda: decode_state(trader, data), number) * 1e6
+        results["codec_bytes_" + str(history)] = len(data)
+        results["jsonpickle_encode_us_" + str(history)] = time_call(lambda: jsonpickle.encode(rolling_state), number) * 1e6
+        results["jsonpickle_decode_us_" + str(history)] = time_call(lambda: jsonpickle.decode(pickled), number) * 1e6
+        results["jsonpickle_bytes_" + str(history)] = len(pickled)
+
+    return results
+
+
+# Per-tick cost of TradeLogger on the day 0 states with the trader's orders and fills, everything
+# included (recording, flushing and writing the file), next to TradingState.toJSON which goes
+# through json.dumps with a __dict__ fallback
+def bench_logger(repeat: int = 3):
+    states = []
+    trader = Trader()
+    for state in replay([load_day(0)]):
+        orders, _, _ = trader.run(state)
+        states.append((state, orders))
+
+    path = os.path.join(tempfile.mkdtemp(), "log.bin")
+
+    def log(visualizer):
+        logger = TradeLogger(path, visualizer=visualizer)
+        for state, orders in states:
+            logger.log(state, orders, state.own_trades)
+        logger.close()
+
+    def to_json():
+        for state, _ in states:
+            state.toJSON()
+
+    results = {
+        "logger_us_per_tick": time_call(lambda: log(False), 1, repeat) / len(states) * 1e6,
+        "logger_visualizer_us_per_tick": time_call(lambda: log(True), 1, repeat) / len(states) * 1e6,
+        "reference_tojson_us_per_tick": time_call(to_json, 1, repeat) / len(states) * 1e6,
+    }
+    os.remove(path)
+    return results
+
+
+# Cold start as the exchange (or a sweep worker) pays it: a fresh interpreter importing trader and
+# making its first Trader.run call. The child prints its own timings so interpreter startup isn't counted.
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from datamodel import OrderDepth, TradingState
+from trader import Trader
+imported = time.perf_counter()
+order_depth = OrderDepth({9998: 5, 9996: 10}, {10002: -5, 10004: -10})
+trader = Trader()
+trader.fast_math = sys.argv[1] == "fast"
+trader.run(TradingState("", 100, {}, {"AMETHYSTS": order_depth}, {}, {}, {}, None))
+called = time.perf_counter()
+print(json.dumps([imported - start, called - imported, "numpy" in sys.modules]))
+"""
+
+
+def bench_startup(repeat: int = 5):
+    def cold_start(mode):
+        best = None
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, mode], capture_output=True, text=True,
+                                    check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            timings = json.loads(output)
+            best = timings if best is None or sum(timings[:2]) < sum(best[:2]) else best
+        return best
+
+    fast = cold_start("fast")
+    numpy_path = cold_start("numpy")
+    return {
+        "startup_import_ms": fast[0] * 1e3,
+        "startup_first_call_ms": fast[1] * 1e3,
+        "startup_numpy_loaded": float(fast[2]),
+        # fast_math off: the first call imports numpy
+        "reference_numpy_first_call_ms": numpy_path[1] * 1e3,
+    }
+
+
+benches = {
+    "loader": bench_loader,
+    "trader_run": bench_trader_run,
+    "matching": bench_matching,
+    "replay": bench_replay,
+    "state_codec": bench_state_codec,
+    "logger": bench_logger,
+    "startup": bench_startup,
+}
+
+
+# Throughputs (*_per_s) should go up, everything else (times, sizes) should go down
+def higher_is_better(name: str) -> bool:
+    return name.endswith("_per_s")
+
+
+# Metrics that got worse than the baseline by more than `tolerance` (relative).
+# jsonpickle_* and reference_* numbers are only reference points and aren't checked.
+def compare(results: dict, baseline: dict, tolerance: float):
+    regressions = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        if not old or name.startswith("jsonpickle_") or name.startswith("reference_"):
+            continue
+        change = (value - old) / old
+        if higher_is_better(name):
+            change = -change
+        if change > tolerance:
+            regressions.append((name, old, value, change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the loader, Trader.run, matching and a full day replay")
+    parser.add_argument("--only", nargs="+", choices=list(benches), default=list(benches))
+    parser.add_argument("--output", default="benchmark.json", help="Where to write the results as JSON")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only:
+        results.update(benches[name]())
+
+    for name, value in results.items():
+        print(name.ljust(32), round(value, 2))
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=1, sort_keys=True)
+
+    if args.compare is not None:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, value, change in regressions:
+            print("REGRESSION", name, round(old, 2), "->", round(value, 2), "(" + str(round(change * 100)) + "% worse)")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against", args.compare)
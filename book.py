@@ -0,0 +1,105 @@
+from typing import Dict, List, Sequence
+
+# Book sides in deltas
+BID = 0
+ASK = 1
+
+
+# Read-only order book snapshot stored as level tuples, best price first (ask volumes positive).
+# Best bid/ask, mid and total depth are worked out once on construction, and the
+# buy_orders/sell_orders dicts the exchange hands us are only built if something reads them.
+# __slots__ and tuples keep the per-snapshot memory down. Don't mutate the dicts,
+# the cached values would go stale.
+class CompactOrderDepth:
+    __slots__ = ("bid_prices", "bid_volumes", "ask_prices", "ask_volumes",
+                 "best_bid", "best_ask", "mid", "total_volume", "buy_cache", "sell_cache")
+
+    def __init__(self, buy_orders: Dict[int, int], sell_orders: Dict[int, int]):
+        bid_prices = sorted(buy_orders, reverse=True)
+        ask_prices = sorted(sell_orders)
+        self.set_levels(tuple(bid_prices), tuple(buy_orders[price] for price in bid_prices),
+                        tuple(ask_prices), tuple(-sell_orders[price] for price in ask_prices))
+        self.buy_cache = buy_orders
+        self.sell_cache = sell_orders
+
+    # Build from levels that are already sorted best price first
+    @classmethod
+    def from_levels(cls, bid_prices: Sequence[int], bid_volumes: Sequence[int], ask_prices: Sequence[int], ask_volumes: Sequence[int]):
+        order_depth = cls.__new__(cls)
+        order_depth.set_levels(tuple(bid_prices), tuple(bid_volumes), tuple(ask_prices), tuple(ask_volumes))
+        order_depth.buy_cache = None
+        order_depth.sell_cache = None
+        return order_depth
+
+    def set_levels(self, bid_prices, bid_volumes, ask_prices, ask_volumes):
+        self.bid_prices = bid_prices
+        self.bid_volumes = bid_volumes
+        self.ask_prices = ask_prices
+        self.ask_volumes = ask_volumes
+
+        self.best_bid = bid_prices[0] if bid_prices else None
+        self.best_ask = ask_prices[0] if ask_prices else None
+
+        if self.best_bid is None:
+            self.mid = self.best_ask
+        elif self.best_ask is None:
+            self.mid = self.best_bid
+        else:
+            self.mid = (self.best_ask + self.best_bid) / 2
+
+        self.total_volume = sum(bid_volumes) + sum(ask_volumes)
+
+    @property
+    def buy_orders(self) -> Dict[int, int]:
+        if self.buy_cache is None:
+            self.buy_cache = dict(zip(self.bid_prices, self.bid_volumes))
+        return self.buy_cache
+
+    @property
+    def sell_orders(self) -> Dict[int, int]:
+        if self.sell_cache is None:
+            self.sell_cache = {price: -volume for price, volume in zip(self.ask_prices, self.ask_volumes)}
+        return self.sell_cache
+
+    # What TradingState.toJSON and ProsperityEncoder serialise, the same fields as OrderDepth
+    @property
+    def __dict__(self):
+        return {"buy_orders": self.buy_orders, "sell_orders": self.sell_orders}
+
+
+def levels_of(order_depth):
+    if order_depth is None:
+        return (), (), (), ()
+    if isinstance(order_depth, CompactOrderDepth):
+        return order_depth.bid_prices, order_depth.bid_volumes, order_depth.ask_prices, order_depth.ask_volumes
+
+    bid_prices = sorted(order_depth.buy_orders, reverse=True)
+    ask_prices = sorted(order_depth.sell_orders)
+    return (bid_prices, [order_depth.buy_orders[price] for price in bid_prices],
+            ask_prices, [-order_depth.sell_orders[price] for price in ask_prices])
+
+
+def side_deltas(side: int, previous_prices, previous_volumes, prices, volumes, deltas: List[tuple]):
+    if previous_prices == prices and previous_volumes == volumes:
+        return
+
+    previous = dict(zip(previous_prices, previous_volumes))
+    for price, volume in zip(prices, volumes):
+        if previous.pop(price, None) != volume:
+            deltas.append((side, price, volume))
+    for price in previous:
+        deltas.append((side, price, 0))
+
+
+# What changed between two snapshots of a product's book, as (side, price, new volume) tuples with
+# positive volumes: levels added or resized carry their volume, removed levels volume 0.
+# previous None (first snapshot) gives every level as added. Unchanged books give [].
+# A level displayed with volume 0 (it happens in the data) counts as absent.
+def book_deltas(previous, current) -> List[tuple]:
+    previous_bid_prices, previous_bid_volumes, previous_ask_prices, previous_ask_volumes = levels_of(previous)
+    bid_prices, bid_volumes, ask_prices, ask_volumes = levels_of(current)
+
+    deltas = []
+    side_deltas(BID, previous_bid_prices, previous_bid_volumes, bid_prices, bid_volumes, deltas)
+    side_deltas(ASK, previous_ask_prices, previous_ask_volumes, ask_prices, ask_volumes, deltas)
+    return deltas
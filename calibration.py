@@ -0,0 +1,152 @@
+from data_loader import DAY_LENGTH, PriceData, load_days
+from run_data import day_files
+from trade_tape import TradeTape
+from trader import CALIBRATION_VERSION, Trader
+import argparse
+import json
+import numpy as np
+
+GAMMA_GRID = np.logspace(-3, 3, 201)
+
+
+def product_rows(prices: PriceData, product: str):
+    return np.flatnonzero(prices.product == prices.products.index(product))
+
+
+# Volume weighted trade price per snapshot over (previous snapshot, snapshot], 0 without trades
+def tick_vwap(timestamp, tape: TradeTape, product: str):
+    if product not in tape.timestamp:
+        return np.zeros(len(timestamp))
+
+    previous = np.concatenate(([timestamp[0] - 1], timestamp[:-1]))
+    lo = np.searchsorted(tape.timestamp[product], previous, side="right")
+    hi = np.searchsorted(tape.timestamp[product], timestamp, side="right")
+    quantity = tape.quantity_sum[product][hi] - tape.quantity_sum[product][lo]
+    notional = tape.notional_sum[product][hi] - tape.notional_sum[product][lo]
+    return np.where(quantity > 0, notional / np.maximum(quantity, 1), 0.0)
+
+
+# Sigma as Trader.calc_AS_params defines it: std of the avg trade price ratio to the previous tick
+# (1 when the previous tick had no trades), over the whole history at once
+def fit_sigma(prices: PriceData, tape: TradeTape, product: str) -> float:
+    timestamp = prices.timestamp[product_rows(prices, product)]
+    if len(timestamp) == 0:
+        return 0.0
+
+    current = tick_vwap(timestamp, tape, product)
+    last = np.concatenate(([0.0], current[:-1]))
+    ratio = np.where(last > 0, current / np.where(last > 0, last, 1), 1.0)
+    return float(np.std(ratio))
+
+
+# Order arrival intensity: fit lambda(delta) = A * exp(-kappa * delta), where lambda(delta) is the
+# number of trades per tick printed at least delta away from the mid price
+def fit_kappa(prices: PriceData, tape: TradeTape, product: str) -> float:
+    rows = product_rows(prices, product)
+    if len(rows) == 0 or product not in tape.timestamp:
+        return 1.0
+
+    timestamp = prices.timestamp[rows]
+    mid = prices.mid_price[rows]
+
+    # Mid of the latest snapshot at or before each trade
+    snapshot = np.searchsorted(timestamp, tape.timestamp[product], side="right") - 1
+    valid = snapshot >= 0
+    distance = np.abs(tape.price[product][valid] - mid[snapshot[valid]])
+    if len(distance) == 0:
+        return 1.0
+
+    grid = np.arange(0, np.ceil(distance.max()) + 0.5, 0.5)
+    counts = len(distance) - np.searchsorted(np.sort(distance), grid, side="left")
+    intensity = counts / len(timestamp)
+
+    usable = intensity > 0
+    if usable.sum() < 2:
+        return 1.0
+
+    slope, _ = np.polyfit(grid[usable], np.log(intensity[usable]), 1)
+    return float(-slope) if slope < 0 else 1.0
+
+
+# Gamma whose model half spread is closest (mean absolute error over the ticks) to the market half spread,
+# with T - t taken the way Trader sees it from the exchange's day-local timestamps.
+# None when the best gamma is an end of GAMMA_GRID: the model can't reach the market spread with
+# this sigma/kappa at any gamma (its half spread tops out near 1 / kappa), so nothing was fitted.
+def fit_gamma(prices: PriceData, product: str, sigma: float, kappa: float):
+    rows = product_rows(prices, product)
+    half_spread = (prices.ask_price[rows, 0] - prices.bid_price[rows, 0]) / 2
+    quoted = ~np.isnan(half_spread)
+    if not quoted.any():
+        return None
+
+    remaining = 1 - (prices.timestamp[rows][quoted] % DAY_LENGTH) / Trader().max_timestamp
+    gamma = GAMMA_GRID[:, None]
+    model = (gamma * sigma * sigma * remaining[None, :] + 2 * np.log(1 + gamma / kappa) / gamma) / 2
+    error = np.mean(np.abs(model - half_spread[quoted][None, :]), axis=1)
+    best = int(np.argmin(error))
+    if best == 0 or best == len(GAMMA_GRID) - 1:
+        return None
+    return float(GAMMA_GRID[best])
+
+
+# Fit sigma, kappa and gamma for every product of a (possibly stitched) stream.
+# Products whose gamma can't be fitted keep Trader's preset gamma, "gamma_fitted" tells them apart.
+def fit(prices: PriceData, trades) -> dict:
+    tape = TradeTape(trades)
+    trader = Trader()
+    table = {}
+    for product in prices.products:
+        sigma = fit_sigma(prices, tape, product)
+        kappa = fit_kappa(prices, tape, product)
+        gamma = fit_gamma(prices, product, sigma, kappa)
+        table[product] = {"sigma": sigma, "kappa": kappa, "gamma": gamma if gamma is not None else trader.gamma.get(product, trader.default_gamma),
+                          "gamma_fitted": gamma is not None}
+    return table
+
+
+# One table fitted on all the given days
+def calibrate(days, round_number: int = 1) -> dict:
+    files = [day_files(day, round_number) for day in days]
+    prices, trades = load_days([price for price, _ in files], [trade for _, trade in files])
+    return {"version": CALIBRATION_VERSION, "days": list(days), "products": fit(prices, trades)}
+
+
+# Walk forward: the table for each day is fitted on the `window` days before it only.
+# "products" holds the fit on the last `window` days, to trade the day after the data ends.
+def walk_forward(days, window: int, round_number: int = 1) -> dict:
+    if window < 1 or window > len(days):
+        raise ValueError("Walk-forward window must be between 1 and the number of days (" + str(len(days)) + "), got " + str(window))
+
+    days = sorted(days)
+    tables = {}
+    latest = None
+    for i in range(window, len(days) + 1):
+        train = days[i - window:i]
+        fitted = calibrate(train, round_number)["products"]
+        target = days[i] if i < len(days) else None
+        if target is not None:
+            tables[str(target)] = fitted
+        else:
+            latest = fitted
+
+    return {"version": CALIBRATION_VERSION, "days": days, "window": window, "products": latest, "walk_forward": tables}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit per-product sigma, kappa and gamma for Trader from day files")
+    parser.add_argument("--days", type=int, nargs="+", default=[-2, -1, 0])
+    parser.add_argument("--round", type=int, default=1)
+    parser.add_argument("--walk-forward", type=int, default=None, help="Refit on rolling windows of this many days")
+    parser.add_argument("--output", default="calibration.json")
+    args = parser.parse_args()
+
+    if args.walk_forward is None:
+        table = calibrate(args.days, args.round)
+    elif not 1 <= args.walk_forward <= len(args.days):
+        parser.error("--walk-forward must be between 1 and the number of --days (" + str(len(args.days)) + ")")
+    else:
+        table = walk_forward(args.days, args.walk_forward, args.round)
+
+    with open(args.output, "w") as file:
+        json.dump(table, file, indent=1)
+    print(json.dumps(table["products"], indent=1))
@@ -0,0 +1,90 @@
+import numpy as np
+
+# Conversions trade our position with the other island at the ConversionObservation prices:
+#   c > 0 buys c units there at askPrice + transportFees + importTariff, only while short (c <= -position)
+#   c < 0 sells -c units there at bidPrice - transportFees - exportTariff, only while long (-c <= position)
+# The edge of a conversion is what it saves over closing the same units in the local book instead,
+# walking the levels best price first:
+#   c > 0: cost of buying c locally - c * import price
+#   c < 0: -c * export price - revenue of selling -c locally
+# Every signed size in -position_limit..position_limit is scored at once. This is the batch mode for
+# research, Trader scores the current tick with the scalar trader.choose_conversion.
+
+
+# Total price of `sizes` units taken from levels (best first, positive volumes, NaN price for a
+# missing level), units beyond the displayed depth are priced at the last level.
+# prices/volumes are (..., levels), the result is (..., len(sizes)), NaN with an empty book side.
+def walk_book(prices, volumes, sizes):
+    prices = np.asarray(prices, dtype=np.float64)
+    volumes = np.where(np.isnan(prices), 0, np.asarray(volumes, dtype=np.float64))
+    sizes = np.asarray(sizes, dtype=np.float64)
+
+    before = np.cumsum(volumes, axis=-1) - volumes
+    fill = np.clip(sizes[:, None] - before[..., None, :], 0, volumes[..., None, :])
+    notional = np.sum(fill * np.nan_to_num(prices)[..., None, :], axis=-1)
+
+    # Last displayed level per book
+    levels = np.sum(volumes > 0, axis=-1)
+    last = np.take_along_axis(prices, np.maximum(levels - 1, 0)[..., None], axis=-1)
+    last = np.where(levels[..., None] > 0, last, np.nan)
+    return notional + (sizes - fill.sum(axis=-1)) * last
+
+
+# Edge of every signed conversion size -position_limit..position_limit, for one tick or a whole
+# batch of ticks (observation values as arrays, book levels as (ticks, levels) arrays).
+# Returns (sizes, edges) with edges shaped (..., len(sizes)).
+def conversion_edges(bid, ask, transport, export_tariff, import_tariff,
+                     bid_prices, bid_volumes, ask_prices, ask_volumes, position_limit: int):
+    units = np.arange(position_limit + 1)
+    buy_price = np.asarray(ask, dtype=np.float64) + transport + import_tariff
+    sell_price = np.asarray(bid, dtype=np.float64) - transport - export_tariff
+
+    import_edge = walk_book(ask_prices, ask_volumes, units) - units * buy_price[..., None]
+    export_edge = units * sell_price[..., None] - walk_book(bid_prices, bid_volumes, units)
+
+    sizes = np.arange(-position_limit, position_limit + 1)
+    edges = np.concatenate((export_edge[..., :0:-1], import_edge), axis=-1)
+    return sizes, edges
+
+
+# Best conversion count given the position before converting (scalar or per tick array):
+# the size with the highest positive edge that only reduces the position, 0 if none pays
+def best_conversions(sizes, edges, position):
+    position = np.asarray(position)[..., None]
+    feasible = ((sizes > 0) & (sizes <= -position)) | ((sizes < 0) & (-sizes <= position))
+    edges = np.where(feasible & ~np.isnan(edges), edges, 0.0)
+
+    best = np.argmax(edges, axis=-1)
+    best_edge = np.take_along_axis(edges, best[..., None], axis=-1)[..., 0]
+    return np.where(best_edge > 0, sizes[best], 0), np.maximum(best_edge, 0)
+
+
+# Observation file of a day as columns: timestamp,bidPrice,askPrice,transportFees,exportTariff,importTariff,sunlight,humidity
+def load_observations(path: str) -> dict:
+    with open(path, "r") as file:
+        header = file.readline().strip()
+    delimiter = ";" if ";" in header else ","
+    columns = header.split(delimiter)
+    data = np.loadtxt(path, delimiter=delimiter, skiprows=1, ndmin=2)
+    return {column: data[:, i] for i, column in enumerate(columns)}
+
+
+# Batch mode for research: score a whole day of one product's observations against its books.
+# Each snapshot uses the latest observation at or before it. positions (per snapshot) default to
+# flat, in which case only the edges are of interest.
+# Returns the timestamps, the sizes, the (ticks, sizes) edges and the best conversion and edge per tick.
+def conversions_day(prices, observations: dict, product: str, position_limit: int, positions=None):
+    rows = prices.product == prices.products.index(product)
+    timestamp = prices.timestamp[rows]
+
+    index = np.maximum(np.searchsorted(observations["timestamp"], timestamp, side="right") - 1, 0)
+    sizes, edges = conversion_edges(
+        observations["bidPrice"][index], observations["askPrice"][index], observations["transportFees"][index],
+        observations["exportTariff"][index], observations["importTariff"][index],
+        prices.bid_price[rows], prices.bid_volume[rows], prices.ask_price[rows], prices.ask_volume[rows],
+        position_limit,
+    )
+
+    positions = np.zeros(len(timestamp), dtype=np.int64) if positions is None else positions
+    conversions, conversion_edge = best_conversions(sizes, edges, positions)
+    return timestamp, sizes, edges, conversions, conversion_edge
@@ -0,0 +1,346 @@
+from datamodel import Trade
+from book import CompactOrderDepth
+from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+# Bump whenever the on-disk column layout changes so stale caches are ignored
+CACHE_VERSION = 1
+cache_folder = ".cache"
+
+LEVELS = 3
+
+# Timestamps run from 0 to 999900 inside a day, day d of a multi-day stream starts at d * DAY_LENGTH
+DAY_LENGTH = 1000000
+
+PRICE_HEADER = "day;timestamp;product;bid_price_1;bid_volume_1;bid_price_2;bid_volume_2;bid_price_3;bid_volume_3;ask_price_1;ask_volume_1;ask_price_2;ask_volume_2;ask_price_3;ask_volume_3;mid_price;profit_and_loss"
+TRADE_HEADER = "timestamp;buyer;seller;symbol;currency;price;quantity"
+
+
+# One prices_round_*_day_*.csv file decoded into columns.
+# Rows keep the file order. Missing book levels have a NaN price and a 0 volume,
+# ask volumes are stored positive (the file format) and negated in order_depth().sell_orders.
+class PriceData:
+    columns = ["day", "timestamp", "product", "bid_price", "bid_volume", "ask_price", "ask_volume", "mid_price", "profit_and_loss"]
+
+    def __init__(self, products: List[str], day, timestamp, product, bid_price, bid_volume, ask_price, ask_volume, mid_price, profit_and_loss):
+        self.products = products
+        self.day = day
+        self.timestamp = timestamp
+        self.product = product
+        self.bid_price = bid_price
+        self.bid_volume = bid_volume
+        self.ask_price = ask_price
+        self.ask_volume = ask_volume
+        self.mid_price = mid_price
+        self.profit_and_loss = profit_and_loss
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    # Build the order book the exchange would hand us for row i
+    def order_depth(self, i: int) -> CompactOrderDepth:
+        bid_prices = []
+        bid_volumes = []
+        for price, volume in zip(self.bid_price[i].tolist(), self.bid_volume[i].tolist()):
+            if price == price:
+                bid_prices.append(int(price))
+                bid_volumes.append(volume)
+
+        ask_prices = []
+        ask_volumes = []
+        for price, volume in zip(self.ask_price[i].tolist(), self.ask_volume[i].tolist()):
+            if price == price:
+                ask_prices.append(int(price))
+                ask_volumes.append(volume)
+
+        return CompactOrderDepth.from_levels(bid_prices, bid_volumes, ask_prices, ask_volumes)
+
+
+# One trades_round_*_day_*_nn.csv file decoded into columns.
+# buyer/seller are codes into self.traders ("" for the anonymised files).
+class TradeData:
+    columns = ["timestamp", "symbol", "price", "quantity", "buyer", "seller"]
+
+    def __init__(self, products: List[str], traders: List[str], timestamp, symbol, price, quantity, buyer, seller):
+        self.products = products
+        self.traders = traders
+        self.timestamp = timestamp
+        self.symbol = symbol
+        self.price = price
+        self.quantity = quantity
+        self.buyer = buyer
+        self.seller = seller
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def trade(self, i: int) -> Trade:
+        return Trade(self.products[self.symbol[i]], float(self.price[i]), int(self.quantity[i]),
+                     self.traders[self.buyer[i]], self.traders[self.seller[i]], int(self.timestamp[i]))
+
+
+# Hash of the raw file content, used as the cache key
+def file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_of(codes: Dict[str, int], names: List[str], name: str) -> int:
+    code = codes.get(name)
+    if code is None:
+        code = len(names)
+        codes[name] = code
+        names.append(name)
+    return code
+
+
+def parse_prices(path: str) -> PriceData:
+    with open(path, "r") as file:
+        lines = file.read().splitlines()
+
+    return decode_prices([line.split(";") for line in lines[1:] if line])
+
+
+# Decode split prices rows (no header), also used for the slices read through day_index
+def decode_prices(rows: List[List[str]]) -> PriceData:
+    n = len(rows)
+
+    products = []
+    product_codes = {}
+    day = np.empty(n, dtype=np.int32)
+    timestamp = np.empty(n, dtype=np.int64)
+    product = np.empty(n, dtype=np.int16)
+    bid_price = np.full((n, LEVELS), np.nan)
+    bid_volume = np.zeros((n, LEVELS), dtype=np.int32)
+    ask_price = np.full((n, LEVELS), np.nan)
+    ask_volume = np.zeros((n, LEVELS), dtype=np.int32)
+    mid_price = np.empty(n)
+    profit_and_loss = np.empty(n)
+
+    for i, data in enumerate(rows):
+        day[i] = int(data[0])
+        timestamp[i] = int(data[1])
+        product[i] = code_of(product_codes, products, data[2])
+
+        for level in range(LEVELS):
+            if data[3 + 2 * level] != "":
+                bid_price[i, level] = float(data[3 + 2 * level])
+                bid_volume[i, level] = int(data[4 + 2 * level])
+            if data[9 + 2 * level] != "":
+                ask_price[i, level] = float(data[9 + 2 * level])
+                ask_volume[i, level] = int(data[10 + 2 * level])
+
+        mid_price[i] = float(data[15])
+        profit_and_loss[i] = float(data[16])
+
+    return PriceData(products, day, timestamp, product, bid_price, bid_volume, ask_price, ask_volume, mid_price, profit_and_loss)
+
+
+def parse_trades(path: str) -> TradeData:
+    with open(path, "r") as file:
+        lines = file.read().splitlines()
+
+    return decode_trades([line.split(";") for line in lines[1:] if line])
+
+
+def decode_trades(rows: List[List[str]]) -> TradeData:
+    n = len(rows)
+
+    products = []
+    product_codes = {}
+    traders = [""]
+    trader_codes = {"": 0}
+    timestamp = np.empty(n, dtype=np.int64)
+    symbol = np.empty(n, dtype=np.int16)
+    price = np.empty(n)
+    quantity = np.empty(n, dtype=np.int32)
+    buyer = np.empty(n, dtype=np.int16)
+    seller = np.empty(n, dtype=np.int16)
+
+    for i, data in enumerate(rows):
+        timestamp[i] = int(data[0])
+        buyer[i] = code_of(trader_codes, traders, data[1])
+        seller[i] = code_of(trader_codes, traders, data[2])
+        symbol[i] = code_of(product_codes, products, data[3])
+        price[i] = float(data[5])
+        quantity[i] = int(data[6])
+
+    return TradeData(products, traders, timestamp, symbol, price, quantity, buyer, seller)
+
+
+# One folder per file content, kind and cache version, so a version bump writes next to the old
+# cache instead of onto it
+def cache_path(path: str, kind: str) -> str:
+    return os.path.join(cache_folder, file_hash(path) + "." + kind + ".v" + str(CACHE_VERSION))
+
+
+# Write path (a file, or a folder with folder=True) through a temporary one next to it, moved in
+# with os.replace, so a crashed run never leaves a half written cache behind. write(tmp_path) fills
+# the temporary path. An existing folder at path is cleared first unless keep(path) says it's still good.
+def write_atomic(path: str, write, folder: bool = False, keep=None):
+    tmp_path = path + ".tmp" + str(os.getpid())
+    if folder:
+        os.makedirs(tmp_path, exist_ok=True)
+    write(tmp_path)
+
+    if folder and os.path.isdir(path) and (keep is None or not keep(path)):
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process filled the cache first, keep theirs
+        if folder:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_cache(folder: str, data, meta: dict):
+    def write(tmp_folder):
+        for column in data.columns:
+            np.save(os.path.join(tmp_folder, column + ".npy"), getattr(data, column))
+        with open(os.path.join(tmp_folder, "meta.json"), "w") as file:
+            json.dump(meta, file)
+
+    # A folder that doesn't read back as a cache (e.g. a crashed copy) is replaced
+    write_atomic(folder, write, folder=True, keep=lambda path: read_cache(path, meta["kind"]) is not None)
+
+
+def read_cache(folder: str, kind: str):
+    meta_path = os.path.join(folder, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, "r") as file:
+        meta = json.load(file)
+
+    if meta.get("version") != CACHE_VERSION or meta.get("kind") != kind:
+        return None
+
+    # Plain ndarray views of the memory maps, indexing np.memmap itself is much slower
+    return meta, {
+        name[:-4]: np.load(os.path.join(folder, name), mmap_mode="r").view(np.ndarray)
+        for name in os.listdir(folder) if name.endswith(".npy")
+    }
+
+
+# Load a prices_round_*_day_*.csv file.
+# The first call parses the CSV and writes a binary cache, later calls memory-map the cache.
+def load_prices(path: str, use_cache: bool = True) -> PriceData:
+    if not use_cache:
+        return parse_prices(path)
+
+    folder = cache_path(path, "prices")
+    cached = read_cache(folder, "prices")
+    if cached is not None:
+        meta, columns = cached
+        return PriceData(meta["products"], **columns)
+
+    data = parse_prices(path)
+    write_cache(folder, data, {"version": CACHE_VERSION, "kind": "prices", "products": data.products})
+    return data
+
+
+# Load a trades_round_*_day_*_nn.csv file, cached the same way as load_prices
+def load_trades(path: str, use_cache: bool = True) -> TradeData:
+    if not use_cache:
+        return parse_trades(path)
+
+    folder = cache_path(path, "trades")
+    cached = read_cache(folder, "trades")
+    if cached is not None:
+        meta, columns = cached
+        return TradeData(meta["products"], meta["traders"], **columns)
+
+    data = parse_trades(path)
+    write_cache(folder, data, {"version": CACHE_VERSION, "kind": "trades", "products": data.products, "traders": data.traders})
+    return data
+
+
+# Parse a day's files and fill the cache, run inside a worker process
+def warm_cache(paths):
+    price_path, trade_path = paths
+    load_prices(price_path)
+    if trade_path is not None:
+        load_trades(trade_path)
+
+
+def is_cached(path: str, kind: str) -> bool:
+    return read_cache(cache_path(path, kind), kind) is not None
+
+
+# Map every file's product codes onto one shared product list
+def merge_codes(names_per_file: List[List[str]]):
+    merged = []
+    codes = {}
+    mappings = []
+    for names in names_per_file:
+        mappings.append(np.array([code_of(codes, merged, name) for name in names] or [0], dtype=np.int16))
+    return merged, mappings
+
+
+# (prices, trades) pairs in the order of their `day` column, whatever order the files were given in,
+# so stitched timestamps only go up. Days without price rows can't be placed and are dropped.
+def sort_days(days):
+    days = sorted((day for day in days if len(day[0]) > 0), key=lambda day: int(day[0].day[0]))
+    numbers = [int(prices.day[0]) for prices, _ in days]
+    if len(set(numbers)) != len(numbers):
+        raise ValueError("The same day was given more than once: " + str(numbers))
+    return days
+
+
+# Load several days and stitch them into one continuous PriceData and TradeData.
+# Days missing from the cache are decoded concurrently in a process pool. Days are put in order of
+# their `day` column (sort_days) and each day's timestamps are shifted by (day - first day) * DAY_LENGTH.
+# A day's trade file (which has no day column) takes the day of the price file at the same index.
+def load_days(price_paths: List[str], trade_paths: List[str] = None, workers: int = None):
+    trade_paths = trade_paths if trade_paths is not None else [None] * len(price_paths)
+    pairs = list(zip(price_paths, trade_paths))
+
+    missing = [pair for pair in pairs if not is_cached(pair[0], "prices") or (pair[1] is not None and not is_cached(pair[1], "trades"))]
+    if len(missing) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(warm_cache, missing))
+
+    days = [(load_prices(price_path), load_trades(trade_path) if trade_path is not None else None) for price_path, trade_path in pairs]
+    days = sort_days(days)
+    if not days:
+        raise ValueError("No price rows in any of the days")
+    first_day = int(days[0][0].day[0])
+    offsets = [(int(prices.day[0]) - first_day) * DAY_LENGTH for prices, _ in days]
+
+    products, mappings = merge_codes([prices.products for prices, _ in days])
+    prices = PriceData(
+        products,
+        np.concatenate([day.day for day, _ in days]),
+        np.concatenate([day.timestamp + offset for (day, _), offset in zip(days, offsets)]),
+        np.concatenate([mapping[day.product] for (day, _), mapping in zip(days, mappings)]),
+        *[np.concatenate([getattr(day, column) for day, _ in days]) for column in PriceData.columns[3:]],
+    )
+
+    trade_days = [(trades, offset) for (_, trades), offset in zip(days, offsets) if trades is not None]
+    if not trade_days:
+        return prices, None
+
+    trade_products, trade_mappings = merge_codes([trades.products for trades, _ in trade_days])
+    traders, trader_mappings = merge_codes([trades.traders for trades, _ in trade_days])
+    trades = TradeData(
+        trade_products,
+        traders,
+        np.concatenate([day.timestamp + offset for day, offset in trade_days]),
+        np.concatenate([mapping[day.symbol] for (day, _), mapping in zip(trade_days, trade_mappings)]),
+        np.concatenate([day.price for day, _ in trade_days]),
+        np.concatenate([day.quantity for day, _ in trade_days]),
+        np.concatenate([mapping[day.buyer] for (day, _), mapping in zip(trade_days, trader_mappings)]),
+        np.concatenate([mapping[day.seller] for (day, _), mapping in zip(trade_days, trader_mappings)]),
+    )
+    return prices, trades
@@ -0,0 +1,134 @@
+from data_loader import PriceData, TradeData, decode_prices, decode_trades, write_atomic
+from replay import replay
+import argparse
+import json
+import os
+import numpy as np
+
+# Bump whenever the index layout changes so stale indexes are rebuilt
+INDEX_VERSION = 1
+
+# Where timestamp and product sit in a row of each file kind
+COLUMNS = {"prices": (1, 2), "trades": (0, 3)}
+
+ROW = np.dtype([("timestamp", np.int64), ("product", np.int16), ("offset", np.int64), ("length", np.int32)])
+
+
+# prices_round_1_day_0.csv -> prices_round_1_day_0.csv.index/ next to it
+def index_path(path: str) -> str:
+    return path + ".index"
+
+
+# A day file's index is valid as long as the file keeps its size and modification time,
+# checking it never reads the day file itself
+def file_stamp(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+# Scan a day file once and write its sidecar index: the byte offset and length of every row,
+# with its timestamp and product code, sorted by timestamp
+def build_index(path: str, kind: str):
+    timestamp_column, product_column = COLUMNS[kind]
+    products = []
+    product_codes = {}
+    rows = []
+
+    with open(path, "rb") as file:
+        offset = len(file.readline())
+        for line in file:
+            if line.strip():
+                data = line.decode().split(";")
+                product = product_codes.get(data[product_column])
+                if product is None:
+                    product = product_codes[data[product_column]] = len(products)
+                    products.append(data[product_column])
+                rows.append((int(data[timestamp_column]), product, offset, len(line)))
+            offset += len(line)
+
+    index = np.array(rows, dtype=ROW)
+    index = index[np.argsort(index["timestamp"], kind="stable")]
+
+    def write(tmp_folder):
+        np.save(os.path.join(tmp_folder, "rows.npy"), index)
+        with open(os.path.join(tmp_folder, "meta.json"), "w") as file:
+            json.dump({"version": INDEX_VERSION, "kind": kind, "products": products, **file_stamp(path)}, file)
+
+    # Any index already there is stale
+    write_atomic(index_path(path), write, folder=True)
+
+
+# The (meta, memory mapped rows) of a day file's index, built on first use
+def load_index(path: str, kind: str):
+    folder = index_path(path)
+    meta_path = os.path.join(folder, "meta.json")
+
+    if os.path.exists(meta_path):
+        with open(meta_path, "r") as file:
+            meta = json.load(file)
+        if meta.get("version") == INDEX_VERSION and meta.get("kind") == kind and {"size": meta.get("size"), "mtime_ns": meta.get("mtime_ns")} == file_stamp(path):
+            return meta, np.load(os.path.join(folder, "rows.npy"), mmap_mode="r")
+
+    build_index(path, kind)
+    return load_index(path, kind)
+
+
+# Split rows of a day file with start <= timestamp <= end (and one of products, if given),
+# in file order. Only those rows' bytes are read: the index is memory mapped and searched with
+# np.searchsorted, so the cost follows the window, not the file.
+def read_rows(path: str, kind: str, start: int, end: int, products=None):
+    meta, index = load_index(path, kind)
+    lo = int(np.searchsorted(index["timestamp"], start, side="left"))
+    hi = int(np.searchsorted(index["timestamp"], end, side="right"))
+    window = np.asarray(index[lo:hi])
+
+    if products is not None:
+        codes = [meta["products"].index(product) for product in products if product in meta["products"]]
+        window = window[np.isin(window["product"], codes)]
+    if len(window) == 0:
+        return []
+
+    window = window[np.argsort(window["offset"], kind="stable")]
+    first = int(window["offset"][0])
+    last = int(window["offset"][-1] + window["length"][-1])
+
+    # One read covering the window, sorted files keep it contiguous
+    with open(path, "rb") as file:
+        file.seek(first)
+        block = file.read(last - first)
+
+    return [block[offset - first:offset - first + length].decode().rstrip("\r\n").split(";")
+            for offset, length in zip(window["offset"].tolist(), window["length"].tolist())]
+
+
+def read_prices(path: str, start: int, end: int, products=None) -> PriceData:
+    return decode_prices(read_rows(path, "prices", start, end, products))
+
+
+def read_trades(path: str, start: int, end: int, products=None) -> TradeData:
+    return decode_trades(read_rows(path, "trades", start, end, products))
+
+
+# Replay only [start, end] of one day, e.g. replay_window(prices_path, trades_path, 495000, 505000, ["STARFRUIT"]).
+# The first state's market trades are those from start up to its timestamp.
+def replay_window(price_path: str, trade_path: str, start: int, end: int, products=None):
+    prices = read_prices(price_path, start, end, products)
+    trades = read_trades(trade_path, start, end, products) if trade_path is not None else None
+    return replay([(prices, trades)])
+
+
+if __name__ == "__main__":
+    from run_data import run_backtest
+    from trader import Trader
+
+    parser = argparse.ArgumentParser(description="Backtest Trader on a time window of one day, reading only that slice of the files")
+    parser.add_argument("prices")
+    parser.add_argument("trades")
+    parser.add_argument("--start", type=int, required=True)
+    parser.add_argument("--end", type=int, required=True)
+    parser.add_argument("--product", nargs="+", default=None)
+    args = parser.parse_args()
+
+    metrics = run_backtest(Trader(), replay_window(args.prices, args.trades, args.start, args.end, args.product))
+    for name, value in metrics.summary().items():
+        print(name + ":", value)
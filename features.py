@@ -0,0 +1,229 @@
+from book import levels_of
+from data_loader import DAY_LENGTH, PriceData, TradeData, file_hash, load_prices, load_trades, write_atomic
+from trade_tape import TradeTape
+from collections import deque
+import json
+import os
+import numpy as np
+
+# Bump whenever a feature definition changes so stale feature caches are recomputed
+FEATURES_VERSION = 1
+
+FEATURES = ["mid", "microprice", "imbalance", "spread", "bid_depth", "ask_depth", "vwap", "returns"]
+
+# Rolling VWAP window in timestamp units, (ts - window, ts]. 2000 is the last 20 ticks.
+VWAP_WINDOW = 2000
+
+
+# Feature kernels, shared by the vectorized pass (arrays over all ticks) and LiveFeatures (numpy scalars).
+# A missing book side has a NaN price and a 0 volume, features that need it come out NaN.
+
+def mid(bid, ask):
+    return np.where(np.isnan(bid), ask, np.where(np.isnan(ask), bid, (bid + ask) / 2))
+
+
+# Top of book prices weighted by the opposite side's volume, leans towards the side about to be taken out
+def microprice(bid, bid_volume, ask, ask_volume):
+    return (bid * ask_volume + ask * bid_volume) / (bid_volume + ask_volume)
+
+
+# In [-1, 1], positive when the best bid shows more volume than the best ask
+def imbalance(bid_volume, ask_volume):
+    return (bid_volume - ask_volume) / (bid_volume + ask_volume)
+
+
+def spread(bid, ask):
+    return ask - bid
+
+
+def vwap(notional, quantity):
+    return np.where(quantity > 0, notional / np.where(quantity > 0, quantity, 1), np.nan)
+
+
+def returns(mid_price, previous_mid):
+    return mid_price / previous_mid - 1
+
+
+# Every feature of every snapshot of one product, as arrays lined up with its timestamps
+def product_features(prices: PriceData, tape: TradeTape, product: str, vwap_window: int = VWAP_WINDOW):
+    rows = np.flatnonzero(prices.product == prices.products.index(product))
+    timestamp = prices.timestamp[rows]
+    bid, ask = prices.bid_price[rows, 0], prices.ask_price[rows, 0]
+    bid_volume, ask_volume = prices.bid_volume[rows, 0], prices.ask_volume[rows, 0]
+
+    columns = {"mid": mid(bid, ask)}
+    columns["microprice"] = microprice(bid, bid_volume, ask, ask_volume)
+    columns["imbalance"] = imbalance(bid_volume, ask_volume)
+    columns["spread"] = spread(bid, ask)
+    columns["bid_depth"] = prices.bid_volume[rows].sum(axis=1).astype(np.float64)
+    columns["ask_depth"] = prices.ask_volume[rows].sum(axis=1).astype(np.float64)
+
+    if product in tape.timestamp:
+        lo = np.searchsorted(tape.timestamp[product], timestamp - vwap_window, side="right")
+        hi = np.searchsorted(tape.timestamp[product], timestamp, side="right")
+        columns["vwap"] = vwap(tape.notional_sum[product][hi] - tape.notional_sum[product][lo],
+                               tape.quantity_sum[product][hi] - tape.quantity_sum[product][lo])
+    else:
+        columns["vwap"] = np.full(len(rows), np.nan)
+
+    columns["returns"] = returns(columns["mid"], np.concatenate(([np.nan], columns["mid"][:-1])))
+    return timestamp, columns
+
+
+# Per-product feature arrays looked up by timestamp. A table from load_features uses its day's own
+# timestamps, replays of stitched days need load_features_days.
+# update() has the same signature as LiveFeatures.update so Trader can use either.
+class FeatureTable:
+    def __init__(self, timestamp: dict, columns: dict) -> None:
+        # {product: timestamps}, {product: {feature: values}}
+        self.timestamp = timestamp
+        self.columns = columns
+
+    @property
+    def products(self):
+        return list(self.timestamp)
+
+    # Features of the latest snapshot at or before timestamp, None before the first one
+    def at(self, product: str, timestamp: int):
+        timestamps = self.timestamp.get(product)
+        if timestamps is None:
+            return None
+        i = int(np.searchsorted(timestamps, timestamp, side="right")) - 1
+        if i < 0:
+            return None
+        return {name: float(values[i]) for name, values in self.columns[product].items()}
+
+    def update(self, product: str, order_depth, market_trades, timestamp: int):
+        return self.at(product, timestamp)
+
+
+def compute_features(prices: PriceData, trades: TradeData, vwap_window: int = VWAP_WINDOW) -> FeatureTable:
+    tape = TradeTape(trades)
+    timestamp = {}
+    columns = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for product in prices.products:
+            timestamp[product], columns[product] = product_features(prices, tape, product, vwap_window)
+    return FeatureTable(timestamp, columns)
+
+
+# prices_round_1_day_0.csv -> prices_round_1_day_0.features.npz in the same folder
+def feature_cache_path(price_path: str) -> str:
+    return os.path.splitext(price_path)[0] + ".features.npz"
+
+
+# Features of one day, cached next to the day files. The cache is reused while the version,
+# the VWAP window and the content of both day files are unchanged.
+def load_features(price_path: str, trade_path: str, vwap_window: int = VWAP_WINDOW) -> FeatureTable:
+    path = feature_cache_path(price_path)
+    meta = {"version": FEATURES_VERSION, "vwap_window": vwap_window, "prices": file_hash(price_path), "trades": file_hash(trade_path)}
+
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            if json.loads(str(cached["meta"])) == meta:
+                timestamp = {}
+                columns = {}
+                for key in cached.files:
+                    if key == "meta":
+                        continue
+                    product, name = key.split(":", 1)
+                    if name == "timestamp":
+                        timestamp[product] = cached[key]
+                    else:
+                        columns.setdefault(product, {})[name] = cached[key]
+                return FeatureTable(timestamp, columns)
+
+    table = compute_features(load_prices(price_path), load_trades(trade_path), vwap_window)
+
+    arrays = {"meta": np.array(json.dumps(meta))}
+    for product in table.products:
+        arrays[product + ":timestamp"] = table.timestamp[product]
+        for name, values in table.columns[product].items():
+            arrays[product + ":" + name] = values
+
+    def write(tmp_path):
+        # Through a file object, np.savez would add .npz to the name
+        with open(tmp_path, "wb") as file:
+            np.savez(file, **arrays)
+
+    write_atomic(path, write)
+    return table
+
+
+# Features of several days lined up with a replay of them stitched together (run_data.load_days):
+# day d is shifted by (d - first day) * DAY_LENGTH, the same offset data_loader.load_days applies.
+# Each day comes from its own cache, so rolling features (VWAP, returns) start over every day.
+def load_features_days(price_paths, trade_paths, vwap_window: int = VWAP_WINDOW) -> FeatureTable:
+    timestamp = {}
+    columns = {}
+    first_day = None
+    for price_path, trade_path in zip(price_paths, trade_paths):
+        prices = load_prices(price_path)
+        if len(prices) == 0:
+            continue
+        day = int(prices.day[0])
+        if first_day is None:
+            first_day = day
+
+        table = load_features(price_path, trade_path, vwap_window)
+        for product in table.products:
+            timestamp.setdefault(product, []).append(table.timestamp[product] + (day - first_day) * DAY_LENGTH)
+            for name, values in table.columns[product].items():
+                columns.setdefault(product, {}).setdefault(name, []).append(values)
+
+    return FeatureTable({product: np.concatenate(parts) for product, parts in timestamp.items()},
+                        {product: {name: np.concatenate(parts) for name, parts in product_columns.items()}
+                         for product, product_columns in columns.items()})
+
+
+# The same features computed one tick at a time from the live book and market trades, inside Trader.run
+class LiveFeatures:
+    def __init__(self, vwap_window: int = VWAP_WINDOW) -> None:
+        self.vwap_window = vwap_window
+        # Per product: last mid, and the (timestamp, notional, quantity) of the trades in the VWAP window
+        self.last_mid = {}
+        self.window = {}
+        self.notional = {}
+        self.quantity = {}
+
+    def update(self, product: str, order_depth, market_trades, timestamp: int):
+        bid_prices, bid_volumes, ask_prices, ask_volumes = levels_of(order_depth)
+
+        bid = np.float64(bid_prices[0] if bid_prices else np.nan)
+        ask = np.float64(ask_prices[0] if ask_prices else np.nan)
+        bid_volume = np.float64(bid_volumes[0] if bid_volumes else 0)
+        ask_volume = np.float64(ask_volumes[0] if ask_volumes else 0)
+
+        # Trades since the last call enter the window, the ones at or before timestamp - window leave it
+        window = self.window.setdefault(product, deque())
+        notional = self.notional.get(product, 0.0)
+        quantity = self.quantity.get(product, 0)
+        for trade in market_trades or []:
+            window.append((trade.timestamp, trade.price * trade.quantity, trade.quantity))
+            notional += trade.price * trade.quantity
+            quantity += trade.quantity
+        while window and window[0][0] <= timestamp - self.vwap_window:
+            _, trade_notional, trade_quantity = window.popleft()
+            notional -= trade_notional
+            quantity -= trade_quantity
+        # Start from exact sums again once the window empties, so float drift can't build up
+        if not window:
+            notional, quantity = 0.0, 0
+        self.notional[product] = notional
+        self.quantity[product] = quantity
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mid_price = mid(bid, ask)
+            features = {
+                "mid": float(mid_price),
+                "microprice": float(microprice(bid, bid_volume, ask, ask_volume)),
+                "imbalance": float(imbalance(bid_volume, ask_volume)),
+                "spread": float(spread(bid, ask)),
+                "bid_depth": float(sum(bid_volumes)),
+                "ask_depth": float(sum(ask_volumes)),
+                "vwap": float(vwap(np.float64(notional), np.float64(quantity))),
+                "returns": float(returns(mid_price, np.float64(self.last_mid.get(product, np.nan)))),
+            }
+
+        self.last_mid[product] = mid_price
+        return features
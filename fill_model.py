@@ -0,0 +1,108 @@
+from datamodel import Order, OrderDepth, Symbol, Trade
+from matching import MatchingEngine
+from typing import Dict, List
+import numpy as np
+
+# Bump whenever the fill rules change, cached backtest results depend on it
+FILL_MODEL_VERSION = 1
+
+
+# Queue-aware passive fills from the market trade tape.
+#
+# An order left unfilled after matching rests until the next snapshot, behind the volume
+# displayed at its price in the book it was placed on. Market trades printed at or through
+# its price in the meantime ((ts, next ts]) eat that queue first, whatever is left fills us:
+#     fill = min(size, max(0, traded volume at or through our price - queue ahead))
+# Bids are reached by trades at price <= bid, asks by trades at price >= ask.
+class PassiveFillModel:
+    def __init__(self) -> None:
+        # (order, queue ahead) left on the book after the last tick
+        self.resting: List[tuple] = []
+
+    # Queue the unfilled remainders of this tick's orders behind the displayed volume
+    def rest(self, orders: List[Order], order_depths: Dict[Symbol, OrderDepth]):
+        self.resting = []
+        # Our own earlier orders at the same price are ahead of later ones
+        ours = {}
+
+        for order in orders:
+            order_depth = order_depths.get(order.symbol)
+            if order_depth is None:
+                continue
+
+            if order.quantity > 0:
+                displayed = order_depth.buy_orders.get(order.price, 0)
+            else:
+                displayed = -order_depth.sell_orders.get(order.price, 0)
+
+            key = (order.symbol, order.price, order.quantity > 0)
+            self.resting.append((order, displayed + ours.get(key, 0)))
+            ours[key] = ours.get(key, 0) + abs(order.quantity)
+
+    # Fill resting orders against the market trades since they were placed, returns our trades per product
+    def fill(self, market_trades: Dict[Symbol, List[Trade]], engine: MatchingEngine, timestamp: int) -> Dict[Symbol, List[Trade]]:
+        own_trades = {}
+
+        for order, queue_ahead in self.resting:
+            trades = market_trades.get(order.symbol)
+            if not trades:
+                continue
+
+            if order.quantity > 0:
+                reached = sum(trade.quantity for trade in trades if trade.price <= order.price)
+            else:
+                reached = sum(trade.quantity for trade in trades if trade.price >= order.price)
+
+            fill = min(abs(order.quantity), reached - queue_ahead)
+            if fill <= 0:
+                continue
+
+            engine.record_fill(order.symbol, order.price, fill if order.quantity > 0 else -fill, timestamp,
+                               own_trades.setdefault(order.symbol, []))
+
+        self.resting = []
+        return own_trades
+
+
+# The same fill rule for a whole day of one product's quotes at once, for sweeps and research.
+# Quote i (price/size arrays, sizes positive, size 0 for no quote) rests on snapshot i,
+# whose book levels are given as (ticks, levels) arrays with positive volumes,
+# and is filled by the tape trades in (snapshot_ts[i], snapshot_ts[i + 1]].
+# Returns the bid and ask fill size per tick.
+def passive_fills_batch(snapshot_ts, bid_price, bid_size, ask_price, ask_size,
+                        book_bid_price, book_bid_volume, book_ask_price, book_ask_volume,
+                        trade_ts, trade_price, trade_quantity):
+    ticks = len(snapshot_ts)
+    bid_price = np.asarray(bid_price, dtype=np.float64)
+    ask_price = np.asarray(ask_price, dtype=np.float64)
+
+    # Displayed volume at our price is the queue ahead of us
+    bid_queue = np.sum(np.where(book_bid_price == bid_price[:, None], book_bid_volume, 0), axis=1)
+    ask_queue = np.sum(np.where(book_ask_price == ask_price[:, None], book_ask_volume, 0), axis=1)
+
+    # Tick each trade falls after, trades up to the first snapshot rest on no quote
+    tick = np.searchsorted(snapshot_ts, trade_ts, side="left") - 1
+    valid = tick >= 0
+    tick = tick[valid]
+    trade_price = np.asarray(trade_price)[valid]
+    trade_quantity = np.asarray(trade_quantity)[valid]
+
+    bid_reached = np.bincount(tick, weights=trade_quantity * (trade_price <= bid_price[tick]), minlength=ticks)
+    ask_reached = np.bincount(tick, weights=trade_quantity * (trade_price >= ask_price[tick]), minlength=ticks)
+
+    bid_fill = np.minimum(bid_size, np.maximum(bid_reached - bid_queue, 0)).astype(np.int64)
+    ask_fill = np.minimum(ask_size, np.maximum(ask_reached - ask_queue, 0)).astype(np.int64)
+    return bid_fill, ask_fill
+
+
+# passive_fills_batch for one product of a decoded day, quotes given per snapshot of that product
+def passive_fills_day(prices, tape, product: str, bid_price, bid_size, ask_price, ask_size):
+    rows = prices.product == prices.products.index(product)
+    lo, hi = tape.range(product, -1, np.iinfo(np.int64).max)
+    return passive_fills_batch(
+        prices.timestamp[rows], bid_price, bid_size, ask_price, ask_size,
+        prices.bid_price[rows], prices.bid_volume[rows], prices.ask_price[rows], prices.ask_volume[rows],
+        tape.timestamp.get(product, np.empty(0, dtype=np.int64))[lo:hi],
+        tape.price.get(product, np.empty(0))[lo:hi],
+        tape.quantity.get(product, np.empty(0))[lo:hi],
+    )
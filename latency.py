@@ -0,0 +1,73 @@
+import math
+
+# Buckets per power of two, ~9% relative resolution
+BUCKETS_PER_OCTAVE = 8
+# Smallest bucket edge in seconds and number of buckets: 100ns up to ~100s
+MIN_SECONDS = 1e-7
+BUCKETS = 30 * BUCKETS_PER_OCTAVE
+
+
+# Fixed-memory latency histogram with log-spaced buckets.
+# Percentiles come back as the upper edge of their bucket, the max is exact.
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        if seconds <= MIN_SECONDS:
+            bucket = 0
+        else:
+            bucket = min(int(math.log2(seconds / MIN_SECONDS) * BUCKETS_PER_OCTAVE), BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        if self.count == 0:
+            return 0.0
+        target = p / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count > 0:
+                return min(MIN_SECONDS * 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE), self.max)
+        return self.max
+
+
+# Per-phase, per-product latency histograms filled by Trader.run when profiling is on
+class Profiler:
+    def __init__(self) -> None:
+        self.histograms = {}
+        self.fallbacks = 0
+
+    def record(self, phase: str, product: str, seconds: float):
+        histogram = self.histograms.get((phase, product))
+        if histogram is None:
+            histogram = self.histograms[(phase, product)] = LatencyHistogram()
+        histogram.record(seconds)
+
+    # One row per (phase, product) with call count and p50/p99/max in microseconds
+    def report(self):
+        rows = []
+        for (phase, product), histogram in sorted(self.histograms.items()):
+            rows.append({
+                "phase": phase,
+                "product": product,
+                "calls": histogram.count,
+                "p50_us": histogram.percentile(50) * 1e6,
+                "p99_us": histogram.percentile(99) * 1e6,
+                "max_us": histogram.max * 1e6,
+            })
+        return rows
+
+    def print_report(self):
+        print("phase".ljust(16), "product".ljust(12), "calls".rjust(8), "p50_us".rjust(10), "p99_us".rjust(10), "max_us".rjust(10))
+        for row in self.report():
+            print(row["phase"].ljust(16), row["product"].ljust(12), str(row["calls"]).rjust(8),
+                  ("%.1f" % row["p50_us"]).rjust(10), ("%.1f" % row["p99_us"]).rjust(10), ("%.1f" % row["max_us"]).rjust(10))
+        print("budget fallbacks:", self.fallbacks)
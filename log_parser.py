@@ -0,0 +1,135 @@
+from data_loader import PRICE_HEADER, TRADE_HEADER
+import argparse
+import json
+import os
+
+SANDBOX = "Sandbox logs:"
+ACTIVITIES = "Activities log:"
+TRADES = "Trade History:"
+SECTIONS = (SANDBOX, ACTIVITIES, TRADES)
+
+
+# Yield (section, line) for every line of an exchange sandbox/submission log, one line at a time
+def iter_sections(path: str):
+    section = None
+    with open(path, "r") as file:
+        for line in file:
+            line = line.rstrip("\n")
+            stripped = line.strip()
+            if stripped in SECTIONS:
+                section = stripped
+                continue
+            if section is not None and stripped:
+                yield section, line
+
+
+# Yield the per-tick sandbox entries ({"sandboxLog", "lambdaLog", "timestamp"}) one object at a time
+def iter_sandbox_logs(path: str):
+    lines = []
+    for section, line in iter_sections(path):
+        if section != SANDBOX:
+            continue
+        lines.append(line)
+        if line.startswith("}"):
+            yield json.loads("\n".join(lines))
+            lines = []
+
+
+# Yield the Activities log rows, already in the prices_round_*_day_*.csv format
+def iter_activities(path: str):
+    for section, line in iter_sections(path):
+        if section == ACTIVITIES and not line.startswith("day;"):
+            yield line
+
+
+# Yield the Trade History entries as dicts. The history is a JSON list with trailing commas,
+# so every object is read field by field instead of loading the whole list.
+def iter_trade_history(path: str):
+    trade = None
+    for section, line in iter_sections(path):
+        if section != TRADES:
+            continue
+
+        stripped = line.strip()
+        if stripped.startswith("{"):
+            trade = {}
+        elif stripped.startswith("}"):
+            if trade is not None:
+                yield trade
+            trade = None
+        elif trade is not None and ":" in stripped:
+            key, value = stripped.rstrip(",").split(":", 1)
+            trade[key.strip().strip('"')] = json.loads(value.strip())
+
+
+def trade_row(trade: dict) -> str:
+    return ";".join([str(trade["timestamp"]), trade.get("buyer", ""), trade.get("seller", ""), trade["symbol"],
+                     trade.get("currency", "SEASHELLS"), str(float(trade["price"])), str(trade["quantity"])])
+
+
+# Convert a log into the prices/trades day files the local replay reads, streaming both sections.
+# Rows go to one prices file per `day` value. Trade History has no day, a timestamp going backwards
+# starts the next day seen in the activities. Our own trades (SUBMISSION) are left out unless
+# keep_own_trades is set, since the replay re-creates them.
+# Returns the (prices path, trades path) pairs in day order.
+def convert_log(path: str, out_folder: str, round_number: int = 1, keep_own_trades: bool = False):
+    os.makedirs(out_folder, exist_ok=True)
+
+    price_files = {}
+    days = []
+    try:
+        for line in iter_activities(path):
+            day = int(line.split(";", 1)[0])
+            if day not in price_files:
+                price_path = os.path.join(out_folder, "prices_round_" + str(round_number) + "_day_" + str(day) + ".csv")
+                price_files[day] = open(price_path, "w")
+                price_files[day].write(PRICE_HEADER + "\n")
+                days.append(day)
+            price_files[day].write(line + "\n")
+    finally:
+        for file in price_files.values():
+            file.close()
+
+    trade_files = {}
+    day_index = 0
+    last_timestamp = None
+    try:
+        for trade in iter_trade_history(path):
+            if last_timestamp is not None and trade["timestamp"] < last_timestamp and day_index + 1 < len(days):
+                day_index += 1
+            last_timestamp = trade["timestamp"]
+
+            if not keep_own_trades and "SUBMISSION" in (trade.get("buyer"), trade.get("seller")):
+                continue
+
+            day = days[day_index] if days else 0
+            if day not in trade_files:
+                trade_path = os.path.join(out_folder, "trades_round_" + str(round_number) + "_day_" + str(day) + "_nn.csv")
+                trade_files[day] = open(trade_path, "w")
+                trade_files[day].write(TRADE_HEADER + "\n")
+            trade_files[day].write(trade_row(trade) + "\n")
+    finally:
+        for file in trade_files.values():
+            file.close()
+
+    pairs = []
+    for day in days:
+        trade_path = os.path.join(out_folder, "trades_round_" + str(round_number) + "_day_" + str(day) + "_nn.csv")
+        if day not in trade_files:
+            with open(trade_path, "w") as file:
+                file.write(TRADE_HEADER + "\n")
+        price_path = os.path.join(out_folder, "prices_round_" + str(round_number) + "_day_" + str(day) + ".csv")
+        pairs.append((price_path, trade_path))
+    return pairs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert an exchange log into prices/trades day files for run_data.py")
+    parser.add_argument("log")
+    parser.add_argument("out_folder")
+    parser.add_argument("--round", type=int, default=1)
+    parser.add_argument("--keep-own-trades", action="store_true")
+    args = parser.parse_args()
+
+    for price_path, trade_path in convert_log(args.log, args.out_folder, args.round, args.keep_own_trades):
+        print(price_path, trade_path)
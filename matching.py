@@ -0,0 +1,159 @@
+from datamodel import Order, OrderDepth, Symbol, Trade
+from typing import Dict, List
+
+SUBMISSION = "SUBMISSION"
+
+# Bump whenever the matching rules change, cached backtest results depend on it
+MATCHING_VERSION = 2
+
+
+# One side of a product's book for the current tick, best price first.
+# Volumes are consumed in place, `head` skips levels that are used up (or show no volume).
+class Ladder:
+    __slots__ = ("prices", "volumes", "head")
+
+    def __init__(self, prices: List[int], volumes: List[int]) -> None:
+        self.prices = prices
+        self.volumes = volumes
+        self.head = 0
+
+
+# Matches our orders against the visible book of each tick.
+# Liquidity we take is removed for the rest of the tick, so two of our orders
+# can't fill against the same volume, and partial fills leave the remainder on the level.
+class MatchingEngine:
+    def __init__(self) -> None:
+        self.position: Dict[Symbol, int] = {}
+        self.cash = 0
+        self.asks: Dict[Symbol, Ladder] = {}
+        self.bids: Dict[Symbol, Ladder] = {}
+        self.order_depths: Dict[Symbol, OrderDepth] = {}
+        self.timestamp = 0
+
+    # Start a new tick. Ladders are built lazily, once per product and side,
+    # the first time an order needs them instead of sorting the book for every order.
+    def load(self, order_depths: Dict[Symbol, OrderDepth], timestamp: int = 0):
+        self.order_depths = order_depths
+        self.timestamp = timestamp
+        self.asks = {}
+        self.bids = {}
+
+    def ask_ladder(self, product: Symbol) -> Ladder:
+        order_depth = self.order_depths.get(product)
+        if order_depth is None:
+            return None
+        # CompactOrderDepth already holds its levels sorted
+        if hasattr(order_depth, "ask_prices"):
+            ladder = self.asks[product] = Ladder(order_depth.ask_prices, list(order_depth.ask_volumes))
+            return ladder
+        sell_orders = order_depth.sell_orders
+        prices = sorted(sell_orders)
+        ladder = self.asks[product] = Ladder(prices, [-sell_orders[price] for price in prices])
+        return ladder
+
+    def bid_ladder(self, product: Symbol) -> Ladder:
+        order_depth = self.order_depths.get(product)
+        if order_depth is None:
+            return None
+        if hasattr(order_depth, "bid_prices"):
+            ladder = self.bids[product] = Ladder(order_depth.bid_prices, list(order_depth.bid_volumes))
+            return ladder
+        buy_orders = order_depth.buy_orders
+        prices = sorted(buy_orders, reverse=True)
+        ladder = self.bids[product] = Ladder(prices, [buy_orders[price] for price in prices])
+        return ladder
+
+    # Match one order, returns the executed quantity (signed like the order) and records our trades
+    def match(self, order: Order, own_trades: List[Trade] = None) -> int:
+        product = order.symbol
+        quantity = order.quantity
+        price = order.price
+        executed = 0
+
+        # We want to buy (placed a bid), match the asks from the lowest price up
+        if quantity > 0:
+            ladder = self.asks.get(product) or self.ask_ladder(product)
+            if ladder is None:
+                return 0
+
+            prices = ladder.prices
+            volumes = ladder.volumes
+            head = ladder.head
+            levels = len(prices)
+
+            while quantity > 0 and head < levels and prices[head] <= price:
+                # The data has levels showing volume 0, there is nothing to take there
+                if volumes[head] <= 0:
+                    head += 1
+                    continue
+                level_price = prices[head]
+                fill = volumes[head] if volumes[head] < quantity else quantity
+                volumes[head] -= fill
+                quantity -= fill
+                executed += fill
+                self.cash -= fill * level_price
+
+                if own_trades is not None:
+                    own_trades.append(Trade(product, level_price, fill, SUBMISSION, "", self.timestamp))
+                if volumes[head] == 0:
+                    head += 1
+
+        # We want to sell (placed a sell), match the bids from the highest price down
+        elif quantity < 0:
+            ladder = self.bids.get(product) or self.bid_ladder(product)
+            if ladder is None:
+                return 0
+
+            prices = ladder.prices
+            volumes = ladder.volumes
+            head = ladder.head
+            levels = len(prices)
+            quantity = -quantity
+
+            while quantity > 0 and head < levels and prices[head] >= price:
+                # The data has levels showing volume 0, there is nothing to take there
+                if volumes[head] <= 0:
+                    head += 1
+                    continue
+                level_price = prices[head]
+                fill = volumes[head] if volumes[head] < quantity else quantity
+                volumes[head] -= fill
+                quantity -= fill
+                executed -= fill
+                self.cash += fill * level_price
+
+                if own_trades is not None:
+                    own_trades.append(Trade(product, level_price, fill, "", SUBMISSION, self.timestamp))
+                if volumes[head] == 0:
+                    head += 1
+
+        if executed == 0:
+            return 0
+
+        ladder.head = head
+        self.position[product] = self.position.get(product, 0) + executed
+        return executed
+
+    # Match all orders returned by Trader.run, returns our trades per product.
+    # If `resting` is given, the unfilled remainder of every order is appended to it as a new Order.
+    def match_orders(self, orders: Dict[Symbol, List[Order]], resting: List[Order] = None) -> Dict[Symbol, List[Trade]]:
+        own_trades = {}
+        for product, product_orders in orders.items():
+            trades = []
+            for order in product_orders:
+                executed = self.match(order, trades)
+                if resting is not None and executed != order.quantity:
+                    resting.append(Order(order.symbol, order.price, order.quantity - executed))
+            if trades:
+                own_trades[product] = trades
+        return own_trades
+
+    # Book a fill that didn't come from the visible book (e.g. a passive fill), quantity signed
+    def record_fill(self, product: Symbol, price: int, quantity: int, timestamp: int, own_trades: List[Trade] = None):
+        self.cash -= quantity * price
+        self.position[product] = self.position.get(product, 0) + quantity
+        if own_trades is not None:
+            if quantity > 0:
+                own_trades.append(Trade(product, price, quantity, SUBMISSION, "", timestamp))
+            else:
+                own_trades.append(Trade(product, price, -quantity, "", SUBMISSION, timestamp))
@@ -0,0 +1,167 @@
+from datamodel import Trade
+from typing import Dict, List
+import math
+import sys
+
+# Snapshots per day, used to scale the per-tick Sharpe ratio to a daily one
+TICKS_PER_DAY = 10000
+
+
+# Online PnL and risk metrics for a replay, constant memory per tick.
+# PnL is split into realized and unrealized with average-cost accounting per product.
+# If a path is given, one row per tick is streamed to a ';' separated file in chunks of chunk_size rows,
+# with one position column per product seen on the first tick.
+class MetricsWriter:
+    def __init__(self, path: str = None, chunk_size: int = 1000) -> None:
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = None
+        self.buffer = []
+        self.products = None
+
+        self.ticks = 0
+        self.position: Dict[str, int] = {}
+        self.avg_cost: Dict[str, float] = {}
+        self.cash = 0.0
+        self.realized = 0.0
+        self.unrealized = 0.0
+        self.pnl = 0.0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+        self.turnover = 0.0
+        self.fills: Dict[str, int] = {}
+        self.max_inventory: Dict[str, int] = {}
+
+        # Welford mean/variance of the per-tick PnL change, for the Sharpe ratio
+        self.change_mean = 0.0
+        self.change_m2 = 0.0
+
+    # Book one of our fills into the realized PnL and average cost
+    def fill(self, trade: Trade, buy: bool):
+        # A 0 unit trade books nothing (and would divide by zero below while flat)
+        if trade.quantity == 0:
+            return
+
+        product = trade.symbol
+        quantity = trade.quantity if buy else -trade.quantity
+        price = trade.price
+        position = self.position.get(product, 0)
+        avg_cost = self.avg_cost.get(product, 0.0)
+
+        if position == 0 or (position > 0) == (quantity > 0):
+            avg_cost = (avg_cost * abs(position) + price * abs(quantity)) / (abs(position) + abs(quantity))
+        else:
+            closing = min(abs(quantity), abs(position))
+            self.realized += closing * (price - avg_cost) * (1 if position > 0 else -1)
+            if abs(quantity) > abs(position):
+                # Flipped sides, the rest opens a new position at this price
+                avg_cost = price
+
+        position += quantity
+        self.cash -= quantity * price
+        self.position[product] = position
+        self.avg_cost[product] = avg_cost if position != 0 else 0.0
+        self.turnover += abs(quantity) * price
+        self.fills[product] = self.fills.get(product, 0) + 1
+        self.max_inventory[product] = max(self.max_inventory.get(product, 0), abs(position))
+
+    # Update after every tick with our trades of that tick and the mid price of each product
+    def update(self, timestamp: int, own_trades: Dict[str, List[Trade]], mids: Dict[str, float]):
+        for trades in own_trades.values():
+            for trade in trades:
+                self.fill(trade, trade.buyer == "SUBMISSION")
+
+        # Total PnL from cash and positions at mid, what isn't realized yet is unrealized
+        pnl = self.cash
+        for product, position in self.position.items():
+            if position != 0 and mids.get(product) is not None:
+                pnl += position * mids[product]
+        unrealized = pnl - self.realized
+        self.unrealized = unrealized
+        change = pnl - self.pnl
+        self.pnl = pnl
+        self.ticks += 1
+
+        delta = change - self.change_mean
+        self.change_mean += delta / self.ticks
+        self.change_m2 += delta * (change - self.change_mean)
+
+        self.peak = max(self.peak, pnl)
+        self.max_drawdown = max(self.max_drawdown, self.peak - pnl)
+
+        if self.path is not None:
+            if self.products is None:
+                self.products = sorted(mids)
+            row = [timestamp, pnl, self.realized, unrealized, self.peak - pnl, self.turnover]
+            row += [self.position.get(product, 0) for product in self.products]
+            self.buffer.append(";".join(map(str, row)))
+            if len(self.buffer) >= self.chunk_size:
+                self.flush()
+
+    # Per-tick Sharpe ratio of PnL changes, scaled to a day
+    def sharpe(self) -> float:
+        if self.ticks < 2 or self.change_m2 <= 0:
+            return 0.0
+        std = math.sqrt(self.change_m2 / self.ticks)
+        return self.change_mean / std * math.sqrt(TICKS_PER_DAY)
+
+    def flush(self):
+        if self.path is None or not self.buffer:
+            return
+        if self.file is None:
+            self.file = open(self.path, "w")
+            columns = ["timestamp", "pnl", "realized", "unrealized", "drawdown", "turnover"]
+            self.file.write(";".join(columns + ["position_" + product for product in self.products or []]) + "\n")
+        self.file.write("\n".join(self.buffer) + "\n")
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def summary(self) -> dict:
+        return {
+            "pnl": self.pnl,
+            "realized": self.realized,
+            "unrealized": self.unrealized,
+            "max_drawdown": self.max_drawdown,
+            "sharpe": self.sharpe(),
+            "turnover": self.turnover,
+            "fills": sum(self.fills.values()),
+            "position": dict(self.position),
+            "max_inventory": dict(self.max_inventory),
+        }
+
+
+# Offline plot of a metrics file written by MetricsWriter, matplotlib is only needed here
+def plot(path: str, output: str = None):
+    import matplotlib
+    if output is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    with open(path, "r") as file:
+        columns = file.readline().strip().split(";")
+        rows = [line.split(";") for line in file if line.strip()]
+
+    timestamp = [int(row[0]) for row in rows]
+    for name in ("pnl", "realized", "unrealized"):
+        index = columns.index(name)
+        plt.plot(timestamp, [float(row[index]) for row in rows], label=name)
+
+    plt.xlabel('Time')
+    plt.ylabel('PnL')
+    plt.title(path)
+    plt.legend()
+
+    if output is None:
+        plt.show()
+    else:
+        plt.savefig(output)
+
+
+if __name__ == "__main__":
+    # python metrics.py metrics.csv [plot.png]
+    plot(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
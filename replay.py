@@ -0,0 +1,91 @@
+from datamodel import TradingState
+from data_loader import PriceData, TradeData, DAY_LENGTH, sort_days
+from book import book_deltas
+from trade_tape import TradeTape
+from typing import List, Tuple
+import numpy as np
+
+
+# Index ranges [start, end) of consecutive rows sharing a timestamp
+def timestamp_groups(timestamp):
+    if len(timestamp) == 0:
+        return []
+    starts = np.flatnonzero(np.diff(timestamp)) + 1
+    starts = np.concatenate(([0], starts, [len(timestamp)]))
+    return zip(starts[:-1].tolist(), starts[1:].tolist())
+
+
+# Yield (timestamp, {product: OrderDepth}) for every snapshot of a day
+def iter_snapshots(prices: PriceData, offset: int = 0):
+    timestamp = prices.timestamp
+    product = prices.product
+    products = prices.products
+
+    for start, end in timestamp_groups(timestamp):
+        order_depths = {}
+        for i in range(start, end):
+            order_depths[products[product[i]]] = prices.order_depth(i)
+        yield (int(timestamp[start]) + offset, order_depths)
+
+
+# Yield a TradingState for every snapshot of one day.
+# market_trades holds every trade after the previous snapshot up to and including this one,
+# looked up on the trade tape, so trades between two snapshots are never lost.
+def iter_day(prices: PriceData, trades: TradeData, offset: int = 0):
+    tape = TradeTape(trades, offset) if trades is not None else None
+    products = tape.products if tape is not None else []
+    previous = offset - 1
+
+    for timestamp, order_depths in iter_snapshots(prices, offset):
+        market_trades = {}
+        for product in products:
+            product_trades = tape.trades(product, previous, timestamp)
+            if product_trades:
+                market_trades[product] = product_trades
+        previous = timestamp
+
+        yield TradingState("", timestamp, {}, order_depths, {}, market_trades, {}, None)
+
+
+# Attach state.book_deltas = {product: book_deltas(previous, current)} to a stream of states.
+# Products whose book didn't change are left out, a product that disappears gets all its levels removed.
+def with_book_deltas(trading_states):
+    previous = {}
+    for state in trading_states:
+        deltas = {}
+        for product, order_depth in state.order_depths.items():
+            product_deltas = book_deltas(previous.get(product), order_depth)
+            if product_deltas:
+                deltas[product] = product_deltas
+        for product in previous:
+            if product not in state.order_depths:
+                deltas[product] = book_deltas(previous[product], None)
+
+        previous = state.order_depths
+        state.book_deltas = deltas
+        yield state
+
+
+# Lazily replay several days back to back in day order, one TradingState at a time.
+# Each day is shifted by (day - first day) * DAY_LENGTH from its `day` column, the same
+# stitching data_loader.load_days does, so a stream stitched there can be passed as a single day.
+# Every state carries its day in state.day. With deltas, it also carries the book deltas since the
+# previous one (see with_book_deltas).
+def replay(days: List[Tuple[PriceData, TradeData]], deltas: bool = False):
+    if deltas:
+        yield from with_book_deltas(replay(days))
+        return
+
+    days = sort_days(days)
+    if not days:
+        return
+    first_day = int(days[0][0].day[0])
+
+    for prices, trades in days:
+        day = int(prices.day[0])
+
+        offset = (day - first_day) * DAY_LENGTH
+        for state in iter_day(prices, trades, offset):
+            # Day of the snapshot, a stitched stream changes day inside one PriceData
+            state.day = first_day + state.timestamp // DAY_LENGTH
+            yield state
@@ -0,0 +1,230 @@
+from data_loader import cache_folder, file_hash, load_days
+from fill_model import FILL_MODEL_VERSION
+from matching import MATCHING_VERSION
+from metrics import MetricsWriter
+from replay import replay
+from collections import deque
+import ast
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+# Bump whenever the entry layout or what goes into the key changes
+RESULT_CACHE_VERSION = 4
+
+result_folder = os.path.join(cache_folder, "results")
+
+# Oldest (least recently used) entries are evicted past this total size
+MAX_BYTES = 512 << 20
+
+
+# MetricsWriter that also keeps our fills as (timestamp, product, price, signed quantity)
+class RecordingMetrics(MetricsWriter):
+    def __init__(self, path: str = None, chunk_size: int = 1000) -> None:
+        super().__init__(path, chunk_size)
+        self.trades = []
+
+    def fill(self, trade, buy: bool):
+        super().fill(trade, buy)
+        self.trades.append((trade.timestamp, trade.symbol, trade.price, trade.quantity if buy else -trade.quantity))
+
+
+# Modules the replay runs the trader in, their results depend on these as much as on the trader
+BACKTEST_MODULES = ["run_data", "replay"]
+
+# {path: (size, mtime_ns, local modules it imports)}, so a sweep doesn't parse the same files for every key
+import_cache = {}
+
+
+# Names of the local modules a file imports anywhere, function level (lazy) imports included
+def local_imports(path: str):
+    stat = os.stat(path)
+    cached = import_cache.get(path)
+    if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+
+    with open(path, "r") as file:
+        tree = ast.parse(file.read())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module is not None and node.level == 0:
+            names.add(node.module.split(".")[0])
+
+    folder = os.path.dirname(path)
+    local = sorted(name for name in names if os.path.exists(os.path.join(folder, name + ".py")))
+    import_cache[path] = (stat.st_size, stat.st_mtime_ns, local)
+    return local
+
+
+# Hash of the trader's module, the replay modules (run_data, replay) and every local module any of
+# them imports, directly or not (matching, fill_model, trade_tape, metrics, ...)
+def source_hash(trader) -> str:
+    path = os.path.abspath(sys.modules[type(trader).__module__].__file__)
+    folder = os.path.dirname(path)
+
+    pending = [path] + [os.path.join(folder, name + ".py") for name in BACKTEST_MODULES]
+    files = set()
+    while pending:
+        path = pending.pop()
+        if path in files or not os.path.exists(path):
+            continue
+        files.add(path)
+        pending += [os.path.join(os.path.dirname(path), name + ".py") for name in local_imports(path)]
+
+    digest = hashlib.sha1()
+    for path in sorted(files):
+        digest.update(os.path.basename(path).encode())
+        digest.update(file_hash(path).encode())
+    return digest.hexdigest()
+
+
+# Stable, JSON-able description of an attribute value. Objects (estimators, a FeatureTable or
+# LiveFeatures, a Profiler, ...) become their type plus the description of their attributes, arrays a
+# hash of their content. Anything else that isn't plain JSON (functions, open files, ...) raises
+# TypeError, there is no telling what it does to the run.
+def describe(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: describe(item) for key, item in value.items()}
+        return sorted(([describe(key), describe(item)] for key, item in value.items()), key=json.dumps)
+    if isinstance(value, (list, tuple, deque)):
+        return [describe(item) for item in value]
+    if hasattr(value, "tobytes") and hasattr(value, "dtype"):
+        return {"dtype": str(value.dtype), "shape": list(getattr(value, "shape", ())),
+                "sha1": hashlib.sha1(value.tobytes()).hexdigest()}
+
+    attributes = getattr(value, "__dict__", None)
+    if attributes is None and hasattr(type(value), "__slots__"):
+        attributes = {name: getattr(value, name) for name in type(value).__slots__ if hasattr(value, name)}
+    if attributes is None or callable(value):
+        raise TypeError("can't key a " + type(value).__name__)
+    return {"type": type(value).__module__ + "." + type(value).__qualname__, "config": describe(dict(attributes))}
+
+
+# Description of every trader attribute (gamma, position_limit, volatility_mode, calibration,
+# features, ...). Take it before the run, the rolling state fills in as it trades.
+# Raises ValueError naming the attribute when one can't be keyed, such a trader isn't cached.
+def trader_params(trader) -> dict:
+    params = {}
+    for name, value in vars(trader).items():
+        try:
+            params[name] = describe(value)
+        except TypeError as error:
+            raise ValueError("result cache: trader." + name + ": " + str(error)) from None
+    return params
+
+
+def calibration_hash(trader):
+    path = getattr(trader, "calibration_file", None)
+    if path is None or not os.path.exists(path):
+        return None
+    return file_hash(path)
+
+
+def backtest_key(trader, day_hashes, passive_fills: bool = True) -> str:
+    payload = {
+        "version": RESULT_CACHE_VERSION,
+        "source": source_hash(trader),
+        "params": trader_params(trader),
+        # The table is read per day during the run, so its content is part of the key, not just its path
+        "calibration": calibration_hash(trader),
+        "matching": MATCHING_VERSION,
+        "fill_model": FILL_MODEL_VERSION,
+        "passive_fills": passive_fills,
+        "days": day_hashes,
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+# Content hashes of the (prices, trades) files of each day, in order
+def day_hashes(price_paths, trade_paths):
+    return [[file_hash(price_path), file_hash(trade_path) if trade_path is not None else None]
+            for price_path, trade_path in zip(price_paths, trade_paths)]
+
+
+# Backtest results on disk, one folder per key: summary.json, metrics.csv (the per-tick PnL series
+# of MetricsWriter) and fills.csv. Reading an entry touches it, and writing one evicts the least
+# recently used entries until the total size is back under max_bytes.
+class ResultCache:
+    def __init__(self, folder: str = result_folder, max_bytes: int = MAX_BYTES) -> None:
+        self.folder = folder
+        self.max_bytes = max_bytes
+
+    def entry(self, key: str) -> str:
+        return os.path.join(self.folder, key)
+
+    # {"summary", "metrics", "fills"} (paths for the series) or None
+    def get(self, key: str):
+        folder = self.entry(key)
+        summary_path = os.path.join(folder, "summary.json")
+        try:
+            with open(summary_path, "r") as file:
+                summary = json.load(file)
+            os.utime(folder)
+        except (OSError, ValueError):
+            return None
+        return {"summary": summary, "metrics": os.path.join(folder, "metrics.csv"), "fills": os.path.join(folder, "fills.csv")}
+
+    # Folder a new entry's metrics.csv is streamed into before put()
+    def staging(self, key: str) -> str:
+        folder = self.entry(key) + ".tmp" + str(os.getpid())
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def put(self, key: str, staging: str, metrics: RecordingMetrics):
+        with open(os.path.join(staging, "fills.csv"), "w") as file:
+            file.write("timestamp;product;price;quantity\n")
+            file.write("".join(";".join(map(str, trade)) + "\n" for trade in metrics.trades))
+        with open(os.path.join(staging, "summary.json"), "w") as file:
+            json.dump(metrics.summary(), file)
+
+        try:
+            os.replace(staging, self.entry(key))
+        except OSError:
+            # Another process stored the same result first, keep theirs
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+        return self.get(key)
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.folder):
+            folder = os.path.join(self.folder, name)
+            if ".tmp" in name or not os.path.isdir(folder):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(folder, file)) for file in os.listdir(folder))
+                entries.append((os.path.getmtime(folder), size, folder))
+            except OSError:
+                continue
+            total += size
+
+        for _, size, folder in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(folder, ignore_errors=True)
+            total -= size
+
+
+# run_data.run_backtest over the given day files, memoized in the result cache.
+# Raises ValueError for a trader trader_params can't key.
+def cached_backtest(trader, price_paths, trade_paths, passive_fills: bool = True, cache: ResultCache = None):
+    from run_data import run_backtest
+
+    cache = cache if cache is not None else ResultCache()
+    key = backtest_key(trader, day_hashes(price_paths, trade_paths), passive_fills)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    staging = cache.staging(key)
+    metrics = RecordingMetrics(os.path.join(staging, "metrics.csv"))
+    run_backtest(trader, replay([load_days(price_paths, trade_paths)]), metrics, passive_fills)
+    return cache.put(key, staging, metrics)
@@ -1,17 +1,35 @@
 from trader import Trader
 from datamodel import Listing, OrderDepth, Trade, TradingState
+import data_loader
+from replay import replay
+from matching import MatchingEngine
+from fill_model import PassiveFillModel
+from latency import Profiler
+from metrics import MetricsWriter
+from trade_logger import TradeLogger
 
 data_folder = "round-1-island-data-bottle"
 
-# market_files = ["prices_round_1_day_-2.csv", "prices_round_1_day_-1.csv", "prices_round_1_day_0.csv"]
-# trade_files = ["trades_round_1_day_-2_nn.csv", "trades_round_1_day_-1_nn.csv", "trades_round_1_day_0_nn.csv"]
-market_files = ["prices_round_1_day_0.csv"]
-trade_files = ["trades_round_1_day_0_nn.csv"]
+market_files = ["prices_round_1_day_-2.csv", "prices_round_1_day_-1.csv", "prices_round_1_day_0.csv"]
+trade_files = ["trades_round_1_day_-2_nn.csv", "trades_round_1_day_-1_nn.csv", "trades_round_1_day_0_nn.csv"]
+# market_files = ["prices_round_1_day_0.csv"]
+# trade_files = ["trades_round_1_day_0_nn.csv"]
 
 analysis = False
-
-import csv
-import matplotlib.pyplot as plt
+# Record per-phase Trader latencies during the replay and print p50/p99/max at the end
+profile = False
+# Per-tick PnL/risk rows are streamed here, plot them afterwards with: python metrics.py metrics.csv
+metrics_file = "metrics.csv"
+# Log every tick here as binary records (None to disable, print with python trade_logger.py file),
+# visualizer_log switches to the visualizer's JSON lines
+log_file = None
+visualizer_log = False
+# Replay with book deltas for Trader.on_book_deltas
+book_deltas = False
+# Calibration table from calibration.py (None for the live estimates), walk-forward tables switch per day
+calibration_file = None
+
+import numpy as np
 
 def print_state(state: TradingState):
         print("----- STATE -----")
@@ -42,6 +60,10 @@ def print_state(state: TradingState):
 
 # Get the mid price for the orderbook
 def mid_price(order_book: OrderDepth):
+    mid = getattr(order_book, "mid", None)
+    if mid is not None:
+        return mid
+
     max_bid = None
     min_ask = None
 
@@ -59,237 +81,153 @@ def mid_price(order_book: OrderDepth):
     
     return (min_ask + max_bid) / 2
 
-if __name__ == "__main__":
-    market_data = []
-    trade_data = []
-    trading_states = []
-
-    timestamp_base = 0
-    max_price = {}
-    min_price = {}
-
-    # Retrieve data from files
-    for market_file in market_files:
-        path = data_folder + "/" + market_file
-
-        with open(path, 'r') as file:
-            # Create a CSV reader object
-            csv_reader = csv.reader(file)
-            
-            first_row = True
-            # Iterate over each row in the CSV file
-            for row in csv_reader:
-                # Skip label row
-                if first_row:
-                    first_row = False
-                    continue
-                
-                data = row[0].split(";")
-
-                # Extract data
-                timestamp = int(data[1]) + timestamp_base
-                product = data[2]
-                product_price = float(data[15])
-
-                if product not in max_price:
-                    max_price[product] = product_price
-                else:
-                    max_price[product] = max(product_price, max_price[product])
-                
-                if product not in min_price:
-                    min_price[product] = product_price
-                else:
-                    min_price[product] = min(product_price, min_price[product])
-                
-                bid_book = {}
-                for i in [3,5,7]:
-                    if data[i] != "":
-                        bid_book[float(data[i])] = int(data[i+1])
-
-                ask_book = {}
-                for i in [9,11,13]:
-                    if data[i] != "":
-                        ask_book[float(data[i])] = -int(data[i+1])
-
-                order_depth = OrderDepth(bid_book, ask_book)
-
-                last_timestamp = -100 if len(market_data) == 0 else market_data[-1][0]
-                
-                if timestamp == last_timestamp:
-                    market_data[-1][1][product] = order_depth
-                else:
-                    market_data.append((timestamp, {product : order_depth}))
-
-                # if len(market_data) < 10:
-                #     print("------")
-                #     print("Time:", market_data[-1][0])
-                #     for p in market_data[-1][1]:
-                #         print("Product:", p)
-                #         od = market_data[-1][1][p]
-                #         print("     Buy orders:")
-                #         for price in od.buy_orders:
-                #             print(price, "--", od.buy_orders[price])
-                #         print("     Sell orders:")
-                #         for price in od.sell_orders:
-                #             print(price, "--", od.sell_orders[price])
-                #     print("------")
-        
-        timestamp_base = market_data[-1][0]
+# (prices path, trades path) of a day in data_folder
+def day_files(day: int, round_number: int = 1):
+    return (data_folder + "/prices_round_" + str(round_number) + "_day_" + str(day) + ".csv",
+            data_folder + "/trades_round_" + str(round_number) + "_day_" + str(day) + "_nn.csv")
+
+# Load the day files in parallel and stitch them into one continuous stream, returned as a single replay day
+def load_days(market_files, trade_files):
+    prices, trades = data_loader.load_days([data_folder + "/" + market_file for market_file in market_files],
+                                           [data_folder + "/" + trade_file for trade_file in trade_files])
+    return [(prices, trades)]
+
+# One trader's side of a replay: its own matching engine, passive fill model and metrics, and the
+# position, own trades and traderData it gets handed back each tick.
+# Orders first match against the visible book. With passive_fills, what's left rests until the
+# next snapshot and is filled from the market trades by the queue-aware PassiveFillModel.
+class Backtest:
+    def __init__(self, trader: Trader, metrics: MetricsWriter = None, passive_fills: bool = True, logger: TradeLogger = None) -> None:
+        self.trader = trader
+        self.metrics = metrics if metrics is not None else MetricsWriter()
+        self.engine = MatchingEngine()
+        self.fill_model = PassiveFillModel() if passive_fills else None
+        self.logger = logger
+        self.own_trades = {}
+        self.trader_data = ""
+        # Traders with an on_book_deltas(timestamp, deltas) hook get the book changes before run,
+        # and with an on_day(day) hook are told when a new day starts
+        self.on_book_deltas = getattr(trader, "on_book_deltas", None)
+        self.on_day = getattr(trader, "on_day", None)
+        self.day = None
+
+    # Run one tick. The state is this trader's own (copy), mids are shared by all traders of the replay.
+    def step(self, state: TradingState, mids, deltas=None, day=None):
+        engine = self.engine
+        fill_model = self.fill_model
+
+        if day is not None and day != self.day:
+            self.day = day
+            if self.on_day is not None:
+                self.on_day(day)
+
+        if deltas is not None and self.on_book_deltas is not None:
+            self.on_book_deltas(state.timestamp, deltas)
+
+        # Orders resting since the last tick fill against the market trades in between
+        passive_trades = {}
+        if fill_model is not None:
+            passive_trades = fill_model.fill(state.market_trades, engine, state.timestamp)
+            for product in passive_trades:
+                self.own_trades.setdefault(product, []).extend(passive_trades[product])
+
+        # Update to the correct position and hand back our trades and traderData from the last tick
+        state.position = engine.position
+        state.own_trades = self.own_trades
+        state.traderData = self.trader_data
 
-    if analysis:
-        print("Max price", max_price, "Min price", min_price)
+        # Run the trader algo
+        orders, conversions, self.trader_data = self.trader.run(state)
 
-    timestamp_base = 0
-    for trade_file in trade_files:
-        path = data_folder + "/" + trade_file
-
-        with open(path, 'r') as file:
-            # Create a CSV reader object
-            csv_reader = csv.reader(file)
-            
-            first_row = True
-            # Iterate over each row in the CSV file
-            for row in csv_reader:
-                # Skip label row
-                if first_row:
-                    first_row = False
-                    continue
-                
-                data = row[0].split(";")
-
-                # Extract data
-                timestamp = int(data[0]) + timestamp_base
-                product = data[3]
-                price = float(data[5])
-                quantity = int(data[6])
-
-                last_timestamp = -100 if len(trade_data) == 0 else trade_data[-1][0]
-                
-                if timestamp != last_timestamp:
-                    trade_data.append((timestamp, {product : []}))
-
-                if product not in trade_data[-1][1]:
-                    trade_data[-1][1][product] = []
-                
-                trade_data[-1][1][product].append(Trade(product, price, quantity))
-
-                # if len(trade_data) < 10:
-                #     print("------")
-                #     print("Time:", trade_data[-1][0])
-                #     for p in trade_data[-1][1]:
-                #         print("Product:", p)
-                #         tList = trade_data[-1][1][p]
-                #         print("     Trade:")
-                #         for t in tList:
-                #             print(t.price, "--", t.quantity)
-                #     print("------")
-        timestamp_base = trade_data[-1][0]
-    
-    # Create trading states
-    trade_data_index = 0
-    for cur_market_data in market_data:
-        timestamp = int(cur_market_data[0])
-
-        if trade_data_index >= len(trade_data) or timestamp != trade_data[trade_data_index][0]:
-            trading_state = TradingState("", timestamp, {}, cur_market_data[1], {}, {}, {}, None)
-        else:
-            trading_state = TradingState("", timestamp, {}, cur_market_data[1], {}, trade_data[trade_data_index][1], {}, None)
-            trade_data_index += 1
-        
-        trading_states.append(trading_state)
-    
-    # # Check Trading state
-    # for ts in trading_states[:10]:
-    #     print_state(ts)
+        # Order matching, products without a market this tick don't match
+        engine.load(state.order_depths, state.timestamp)
+        resting = [] if fill_model is not None else None
+        self.own_trades = engine.match_orders(orders, resting)
+        if fill_model is not None:
+            fill_model.rest(resting, state.order_depths)
 
-    # Run our trade and do order matching
-    if analysis:
-        exit()
-    
-    position = {}
-    money = 0
-    assets = []
+        tick_trades = dict(self.own_trades)
+        for product in passive_trades:
+            tick_trades[product] = passive_trades[product] + self.own_trades.get(product, [])
+
+        self.metrics.update(state.timestamp, tick_trades, mids)
+
+        if self.logger is not None:
+            self.logger.log(state, orders, tick_trades, conversions, self.trader_data)
+
+    def close(self):
+        self.metrics.close()
+        if self.logger is not None:
+            self.logger.close()
+
+
+# Drive several traders from one pass over the trading states, so the data is decoded and every
+# book built once however many variants are compared. Each trader gets its own TradingState for the
+# state (books and market trades are shared and must not be mutated) and its own Backtest.
+# metrics/loggers are optional lists lined up with traders. Returns the metrics sink of every trader.
+def run_backtests(traders, trading_states, metrics=None, passive_fills: bool = True, loggers=None):
+    backtests = [Backtest(trader, metrics[i] if metrics is not None else None, passive_fills,
+                          loggers[i] if loggers is not None else None)
+                 for i, trader in enumerate(traders)]
+    shared = len(backtests) > 1
 
-    trader = Trader()
     for state in trading_states:
         # print("Time:", state.timestamp)
 
-        # Update to the correct position
-        state.position = position
+        # Value positions at the mid price
+        mids = {product: mid_price(order_depth) for product, order_depth in state.order_depths.items()}
+        # Set when replaying with deltas=True
+        deltas = getattr(state, "book_deltas", None)
+        day = getattr(state, "day", None)
+
+        for backtest in backtests:
+            if shared:
+                backtest.step(TradingState(state.traderData, state.timestamp, state.listings, state.order_depths, {},
+                                           state.market_trades, {}, state.observations), mids, deltas, day)
+            else:
+                backtest.step(state, mids, deltas, day)
+
+    for backtest in backtests:
+        backtest.close()
+    return [backtest.metrics for backtest in backtests]
+
+# Run the trader over a stream of trading states and do the order matching.
+# PnL, drawdown, fills and inventory are tracked online by the metrics sink, which is returned.
+# An optional TradeLogger records every tick's book, trades, orders and fills.
+def run_backtest(trader: Trader, trading_states, metrics: MetricsWriter = None, passive_fills: bool = True, logger: TradeLogger = None):
+    return run_backtests([trader], trading_states, [metrics], passive_fills, [logger])[0]
 
-        # Run the trader algo
-        orders, _, _ = trader.run(state)
-
-        # Order matching
-        for product in orders:
-            # Check if there is market has this product now
-            if product not in state.order_depths:
-                continue
-
-            for my_trade in orders[product]:
-                price = my_trade.price
-                quantity = my_trade.quantity
-
-                # We want to buy (placed a bid)
-                if quantity > 0:
-                    # Match a sell order (ask)
-                    asks = sorted(state.order_depths[product].sell_orders.items())
-
-                    for ask in asks:
-                        ask_price = ask[0]
-                        ask_volume = ask[1]
-
-                        # Order Executed
-                        if ask_price <= price:
-                            executed_quantity = min(quantity, ask_volume)
-                            quantity -= executed_quantity
-
-                            if product not in position:
-                                position[product] = 0
-
-                            position[product] += executed_quantity
-                            money -= executed_quantity * ask_price
-                else: # We want to sell (placed a sell)
-                    quantity = -quantity
-                    # Match a buy order (bid)
-                    bids = sorted(state.order_depths[product].buy_orders.items(), reverse=True)
-
-                    for bid in bids:
-                        bid_price = bid[0]
-                        bid_volume = bid[1]
-
-                        # Order Executed
-                        if bid_price >= price:
-                            executed_quantity = min(quantity, bid_volume)
-                            quantity -= executed_quantity
-
-                            if product not in position:
-                                position[product] = 0
-
-                            position[product] -= executed_quantity
-                            money += executed_quantity * bid_price
-        
-        asset = money
-        # Calculate total asset from mid price
-        for product in position:
-            volume = position[product]
+if __name__ == "__main__":
+    days = load_days(market_files, trade_files)
 
-            product_price = mid_price(state.order_depths[product])
-            asset += volume * product_price
+    if analysis:
+        max_price = {}
+        min_price = {}
+        for prices, _ in days:
+            for code, product in enumerate(prices.products):
+                product_price = prices.mid_price[prices.product == code]
+                max_price[product] = max(product_price.max(), max_price.get(product, -np.inf))
+                min_price[product] = min(product_price.min(), min_price.get(product, np.inf))
+        print("Max price", max_price, "Min price", min_price)
 
-        assets.append(asset)
-        # print("Asset:", asset)
-    
-    plt.plot(assets)
+    # # Check Trading state
+    # for ts in itertools.islice(replay(days), 10):
+    #     print_state(ts)
 
-    # Add labels and title
-    plt.xlabel('Time')
-    plt.ylabel('Total Asset')
-    plt.title('Plot of List of Numbers')
+    # Run our trade and do order matching
+    if analysis:
+        exit()
 
-    # Display the plot
-    plt.show()
+    trader = Trader(calibration_file)
+    if profile:
+        trader.profiler = Profiler()
 
+    # Trading states are built one tick at a time while the trader runs
+    logger = TradeLogger(log_file, visualizer=visualizer_log) if log_file is not None else None
+    metrics = run_backtest(trader, replay(days, book_deltas), MetricsWriter(metrics_file), logger=logger)
 
+    if profile:
+        trader.profiler.print_report()
 
-            
\ No newline at end of file
+    for name, value in metrics.summary().items():
+        print(name + ":", value)
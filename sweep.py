@@ -0,0 +1,205 @@
+from trader import Trader
+from data_loader import PriceData, TradeData, load_prices, load_trades
+from replay import replay
+from run_data import day_files, run_backtests
+from result_cache import RecordingMetrics, ResultCache, backtest_key, day_hashes
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import argparse
+import itertools
+import os
+import random
+import time
+import numpy as np
+
+# Shared memory blocks attached by this worker, kept alive for the worker's lifetime
+worker_blocks = []
+# Days decoded from shared memory in this worker: {day: (PriceData, TradeData)}
+worker_days = {}
+# File hashes per day for the result cache keys, None with the cache off
+worker_hashes = None
+
+
+# Copy every column of a PriceData/TradeData into its own shared memory block.
+# Returns a picklable description the workers use to attach without copying.
+def share_columns(data, blocks):
+    columns = {}
+    for column in data.columns:
+        array = np.ascontiguousarray(getattr(data, column))
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        columns[column] = (block.name, array.shape, array.dtype.str)
+    return columns
+
+
+def attach_columns(columns):
+    arrays = {}
+    for column, (name, shape, dtype) in columns.items():
+        block = shared_memory.SharedMemory(name=name)
+        worker_blocks.append(block)
+        arrays[column] = np.ndarray(shape, dtype, buffer=block.buf)
+    return arrays
+
+
+def init_worker(shared_days, hashes=None):
+    global worker_hashes
+    worker_hashes = hashes
+    for day, (price_meta, price_columns, trade_meta, trade_columns) in shared_days.items():
+        prices = PriceData(price_meta["products"], **attach_columns(price_columns))
+        trades = TradeData(trade_meta["products"], trade_meta["traders"], **attach_columns(trade_columns))
+        worker_days[day] = (prices, trades)
+
+
+# Apply a parameter config to a trader.
+# Per-product dict attributes (gamma, position_limit, ...) get the value for every product.
+def configure(trader: Trader, params: dict):
+    for key, value in params.items():
+        current = getattr(trader, key)
+        if isinstance(current, dict):
+            for product in current:
+                current[product] = value
+        else:
+            setattr(trader, key, value)
+    return trader
+
+
+# Backtest a batch of configs on one day inside a worker. Configs found in the result cache
+# are read back, the others are replayed together in one pass and stored.
+def run_task(task):
+    batch, day = task
+    cache = ResultCache() if worker_hashes is not None else None
+
+    summaries = {}
+    missing = []
+    for config_id, params in batch:
+        trader = configure(Trader(), params)
+        key = None
+        if cache is not None:
+            key = backtest_key(trader, worker_hashes[day])
+            result = cache.get(key)
+            if result is not None:
+                summaries[config_id] = result["summary"]
+                continue
+        missing.append((config_id, trader, key))
+
+    if missing:
+        staging = [cache.staging(key) if cache is not None else None for _, _, key in missing]
+        metrics = [RecordingMetrics(os.path.join(folder, "metrics.csv") if folder is not None else None) for folder in staging]
+        run_backtests([trader for _, trader, _ in missing], replay([worker_days[day]]), metrics)
+
+        for (config_id, _, key), folder, trader_metrics in zip(missing, staging, metrics):
+            summaries[config_id] = trader_metrics.summary()
+            if cache is not None:
+                cache.put(key, folder, trader_metrics)
+
+    rows = []
+    for config_id, _ in batch:
+        summary = summaries[config_id]
+        rows.append({
+            "config": config_id,
+            "day": day,
+            "pnl": summary["pnl"],
+            "max_drawdown": summary["max_drawdown"],
+            "fills": summary["fills"],
+        })
+    return rows
+
+
+# Parse "name=v1,v2,..." into (name, [values]) with ints/floats converted
+def parse_param(text: str):
+    name, values = text.split("=", 1)
+    parsed = []
+    for value in values.split(","):
+        for cast in (int, float):
+            try:
+                value = cast(value)
+                break
+            except ValueError:
+                pass
+        parsed.append(value)
+    return name, parsed
+
+
+# Full grid of configs, or `samples` configs drawn from it at random
+def make_configs(grid: dict, samples: int = None, seed: int = 0):
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    if samples is not None and samples < len(configs):
+        configs = random.Random(seed).sample(configs, samples)
+    return configs
+
+
+# Configs are run `batch` at a time per task, each batch sharing one replay of the day
+# With use_cache, results come from / go to the result cache (see result_cache.py)
+def sweep(configs, days, round_number=1, workers=None, batch=4, use_cache=True):
+    blocks = []
+    shared_days = {}
+    hashes = {} if use_cache else None
+    for day in days:
+        price_path, trade_path = day_files(day, round_number)
+        prices = load_prices(price_path)
+        trades = load_trades(trade_path)
+        if use_cache:
+            hashes[day] = day_hashes([price_path], [trade_path])
+        shared_days[day] = (
+            {"products": prices.products}, share_columns(prices, blocks),
+            {"products": trades.products, "traders": trades.traders}, share_columns(trades, blocks),
+        )
+
+    numbered = list(enumerate(configs))
+    tasks = [(numbered[i:i + batch], day) for i in range(0, len(numbered), batch) for day in days]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(shared_days, hashes)) as pool:
+            results = [row for rows in pool.map(run_task, tasks, chunksize=1) for row in rows]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    # One row per config: PnL summed over days, worst daily drawdown, total fills
+    table = []
+    for config_id, params in enumerate(configs):
+        rows = [result for result in results if result["config"] == config_id]
+        table.append({
+            **params,
+            "pnl": sum(row["pnl"] for row in rows),
+            "max_drawdown": max(row["max_drawdown"] for row in rows),
+            "fills": sum(row["fills"] for row in rows),
+        })
+    return table
+
+
+def write_table(table, path: str):
+    columns = list(table[0])
+    with open(path, "w") as file:
+        file.write(";".join(columns) + "\n")
+        for row in table:
+            file.write(";".join(str(row[column]) for column in columns) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest a grid of Trader parameters in parallel")
+    parser.add_argument("--param", action="append", default=[], help="Trader attribute and values, e.g. gamma=0.5,1,2 (repeatable)")
+    parser.add_argument("--days", type=int, nargs="+", default=[0])
+    parser.add_argument("--round", type=int, default=1)
+    parser.add_argument("--samples", type=int, default=None, help="Random search: number of configs drawn from the grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch", type=int, default=4, help="Configs replayed together in one pass per task")
+    parser.add_argument("--no-cache", action="store_true", help="Replay every config even if its result is cached")
+    parser.add_argument("--output", default="sweep.csv")
+    args = parser.parse_args()
+
+    grid = dict(parse_param(param) for param in args.param)
+    configs = make_configs(grid, args.samples, args.seed)
+
+    start = time.perf_counter()
+    table = sweep(configs, args.days, args.round, args.workers, args.batch, not args.no_cache)
+    elapsed = time.perf_counter() - start
+
+    write_table(table, args.output)
+    for row in sorted(table, key=lambda row: -row["pnl"]):
+        print(row)
+    print(len(configs), "configs x", len(args.days), "days in", round(elapsed, 2), "s, written to", args.output)
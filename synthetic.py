@@ -0,0 +1,262 @@
+from data_loader import LEVELS, PRICE_HEADER, TRADE_HEADER
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import time
+import numpy as np
+
+# Fair value standard deviation per tick (in price units) of each volatility regime.
+# "switching" flips between calm and volatile, staying in a regime for 1 / SWITCH_PROBABILITY ticks on average.
+VOLATILITY = {"calm": 0.2, "normal": 1.0, "volatile": 3.0}
+SWITCH_PROBABILITY = 0.001
+
+TICK = 100
+MAX_VOLUME = 30
+MAX_TRADE_QUANTITY = 10
+
+# Price rows generated and formatted per batch, keeps memory flat however many ticks are written
+CHUNK_ROWS = 200000
+
+
+# Text is built without a Python loop per row: every field becomes a fixed width block of bytes
+# with a mask of the bytes that are really printed, the blocks of a row are laid side by side and
+# the masked bytes, read row by row, are the file content. An unset mask gives an empty field.
+# Blocks are stored transposed, (width, rows), so filling one is a contiguous copy.
+
+# "0000".."9999" as bytes, (4, 10000), integers are printed four digits at a time by table lookup
+DIGIT_GROUPS = np.array([list(b"%04d" % i) for i in range(10000)], dtype=np.uint8).T.copy()
+POWERS_OF_TEN = 10 ** np.arange(1, 19, dtype=np.int64)
+
+
+def text_field(values, present=None):
+    values = np.asarray(values, dtype=np.bytes_)
+    width = max(values.dtype.itemsize, 1)
+    chars = values.view(np.uint8).reshape(len(values), width).T
+    mask = chars != 0
+    if present is not None:
+        mask &= present
+    return chars, mask
+
+
+def literal_field(text: str, rows: int):
+    chars = np.frombuffer(text.encode(), dtype=np.uint8)
+    return np.broadcast_to(chars[:, None], (len(chars), rows)), np.ones((len(chars), rows), dtype=bool)
+
+
+def int_field(values, present=None):
+    values = np.asarray(values, dtype=np.int64)
+    rows = len(values)
+    negative = values < 0
+    magnitude = np.abs(values)
+    width = len(str(int(magnitude.max()) if rows else 0))
+    groups = -(-width // 4)
+
+    chars = np.empty((4 * groups, rows), dtype=np.uint8)
+    remaining = magnitude
+    for i in range(groups - 1, -1, -1):
+        remaining, group = np.divmod(remaining, 10000)
+        np.take(DIGIT_GROUPS, group, axis=1, out=chars[4 * i:4 * i + 4])
+
+    # Only as many columns as the longest number, leading zeros are dropped and a 0 keeps its last digit
+    chars = chars[4 * groups - width:]
+    digits = np.searchsorted(POWERS_OF_TEN, magnitude, side="right") + 1
+    mask = np.arange(width, 0, -1)[:, None] <= digits
+
+    if negative.any():
+        chars = np.concatenate((np.full((1, rows), ord("-"), dtype=np.uint8), chars))
+        mask = np.concatenate((negative[None, :], mask))
+    if present is not None:
+        mask &= present
+    return chars, mask
+
+
+# Half-integer prices the way Python prints floats: 10001.5, 5041.0
+def half_field(twice):
+    twice = np.asarray(twice, dtype=np.int64)
+    chars, mask = int_field(twice // 2)
+    fraction = np.where(twice % 2 == 1, ord("5"), ord("0")).astype(np.uint8)
+    dot = np.full(len(twice), ord("."), dtype=np.uint8)
+    return np.concatenate((chars, dot[None, :], fraction[None, :])), np.concatenate((mask, np.ones((2, len(twice)), dtype=bool)))
+
+
+def join_fields(fields) -> bytes:
+    rows = fields[0][0].shape[1]
+    blocks = []
+    for i, field in enumerate(fields):
+        if i:
+            blocks.append(literal_field(";", rows))
+        blocks.append(field)
+    blocks.append(literal_field("\n", rows))
+
+    width = sum(len(chars) for chars, _ in blocks)
+    chars = np.empty((width, rows), dtype=np.uint8)
+    mask = np.empty((width, rows), dtype=bool)
+    row = 0
+    for block_chars, block_mask in blocks:
+        chars[row:row + len(block_chars)] = block_chars
+        mask[row:row + len(block_chars)] = block_mask
+        row += len(block_chars)
+
+    # Back to row order, then keep the printed bytes
+    return np.compress(mask.T.ravel(), chars.T.ravel()).tobytes()
+
+
+# Fair value path per product, (ticks, products)
+def fair_values(rng, ticks: int, base, volatility):
+    if volatility == "switching":
+        switches = rng.random((ticks, len(base))) < SWITCH_PROBABILITY
+        volatile = np.cumsum(switches, axis=0) % 2 == 1
+        sigma = np.where(volatile, VOLATILITY["volatile"], VOLATILITY["calm"])
+    else:
+        sigma = VOLATILITY.get(volatility, volatility)
+
+    steps = rng.normal(0, 1, (ticks, len(base))) * sigma
+    steps[0] = 0
+    # Keep books clear of zero and negative prices on long volatile runs
+    return np.maximum(base + np.cumsum(steps, axis=0), 100)
+
+
+# Books and trades of a run of ticks for every product, as columns in file row order (tick, then product).
+# fair is the (ticks, products) fair value of those ticks, first_tick the index of the first one.
+def generate_ticks(rng, fair, first_tick: int, depth: int, trade_intensity: float):
+    ticks, n_products = fair.shape
+    depth = min(max(depth, 1), LEVELS)
+    fair = fair.reshape(-1)
+    rows = len(fair)
+
+    # Best quotes 0-2 ticks around fair value, deeper levels 1-3 ticks further out each
+    bid_price = np.zeros((rows, LEVELS), dtype=np.int64)
+    ask_price = np.zeros((rows, LEVELS), dtype=np.int64)
+    bid_price[:, 0] = np.floor(fair).astype(np.int64) - rng.integers(0, 3, rows)
+    ask_price[:, 0] = np.floor(fair).astype(np.int64) + 1 + rng.integers(0, 3, rows)
+    for level in range(1, LEVELS):
+        bid_price[:, level] = bid_price[:, level - 1] - rng.integers(1, 4, rows)
+        ask_price[:, level] = ask_price[:, level - 1] + rng.integers(1, 4, rows)
+
+    bid_volume = rng.integers(1, MAX_VOLUME + 1, (rows, LEVELS))
+    ask_volume = rng.integers(1, MAX_VOLUME + 1, (rows, LEVELS))
+
+    # The best level is always shown, each deeper one (up to depth) half the time, and only below a shown one
+    bid_present = np.cumprod(np.concatenate((np.ones((rows, 1), dtype=bool), rng.random((rows, LEVELS - 1)) < 0.5), axis=1), axis=1).astype(bool)
+    ask_present = np.cumprod(np.concatenate((np.ones((rows, 1), dtype=bool), rng.random((rows, LEVELS - 1)) < 0.5), axis=1), axis=1).astype(bool)
+    bid_present[:, depth:] = False
+    ask_present[:, depth:] = False
+
+    prices = {
+        "timestamp": np.repeat(np.arange(first_tick, first_tick + ticks, dtype=np.int64) * TICK, n_products),
+        "product": np.tile(np.arange(n_products), ticks),
+        "bid_price": bid_price, "bid_volume": bid_volume, "bid_present": bid_present,
+        "ask_price": ask_price, "ask_volume": ask_volume, "ask_present": ask_present,
+        "twice_mid": bid_price[:, 0] + ask_price[:, 0],
+    }
+
+    # Poisson number of trades per product and tick, each taking the best bid or best ask
+    counts = rng.poisson(trade_intensity, rows)
+    trade_rows = np.repeat(np.arange(rows), counts)
+    buy = rng.random(len(trade_rows)) < 0.5
+    trades = {
+        "timestamp": prices["timestamp"][trade_rows],
+        "product": prices["product"][trade_rows],
+        "price": np.where(buy, ask_price[trade_rows, 0], bid_price[trade_rows, 0]),
+        "quantity": rng.integers(1, MAX_TRADE_QUANTITY + 1, len(trade_rows)),
+    }
+    return prices, trades
+
+
+def price_lines(prices: dict, products, day: int) -> bytes:
+    rows = len(prices["timestamp"])
+    names = np.array(products, dtype=np.bytes_)
+    fields = [int_field(np.full(rows, day)), int_field(prices["timestamp"]), text_field(names[prices["product"]])]
+    for side in ("bid", "ask"):
+        for level in range(LEVELS):
+            present = prices[side + "_present"][:, level]
+            fields.append(int_field(prices[side + "_price"][:, level], present))
+            fields.append(int_field(prices[side + "_volume"][:, level], present))
+    fields.append(half_field(prices["twice_mid"]))
+    fields.append(literal_field("0.0", rows))
+    return join_fields(fields)
+
+
+def trade_lines(trades: dict, products) -> bytes:
+    rows = len(trades["timestamp"])
+    names = np.array(products, dtype=np.bytes_)
+    empty = (np.zeros((0, rows), dtype=np.uint8), np.zeros((0, rows), dtype=bool))
+    return join_fields([
+        int_field(trades["timestamp"]), empty, empty, text_field(names[trades["product"]]),
+        literal_field("SEASHELLS", rows), half_field(trades["price"] * 2), int_field(trades["quantity"]),
+    ])
+
+
+def product_names(count: int):
+    names = ["AMETHYSTS", "STARFRUIT"]
+    return names[:count] + ["PRODUCT" + str(i + 1) for i in range(count - len(names))]
+
+
+# Formatted prices and trades lines of one chunk of ticks, run inside a worker process.
+# Every chunk draws from its own seed so chunks can be made in any order.
+def chunk_lines(task):
+    seed, fair, first_tick, products, day, depth, trade_intensity = task
+    prices, trades = generate_ticks(np.random.default_rng(seed), fair, first_tick, depth, trade_intensity)
+    return price_lines(prices, products, day), trade_lines(trades, products) if len(trades["timestamp"]) else b""
+
+
+# Write prices_round_<r>_day_<d>.csv and trades_round_<r>_day_<d>_nn.csv for every day into out_folder.
+# Days are generated independently from seed and the day's position, so each is reproducible on its own.
+# Chunks of CHUNK_ROWS rows are formatted in parallel by `workers` processes (1 formats them inline).
+# Returns the (prices path, trades path) pairs.
+def generate(out_folder: str, days=(0,), products=2, ticks: int = 10000, depth: int = LEVELS, volatility="normal",
+             trade_intensity: float = 0.25, round_number: int = 1, seed: int = 0, workers: int = None):
+    os.makedirs(out_folder, exist_ok=True)
+    products = product_names(products) if isinstance(products, int) else list(products)
+    base = np.random.default_rng(seed).integers(1000, 20000, len(products)).astype(np.float64)
+    chunk_ticks = max(1, CHUNK_ROWS // len(products))
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    paths = []
+    try:
+        for day_index, day in enumerate(days):
+            fair = fair_values(np.random.default_rng([seed, day_index]), ticks, base, volatility)
+            tasks = [([seed, day_index, first_tick], fair[first_tick:first_tick + chunk_ticks], first_tick, products, day, depth, trade_intensity)
+                     for first_tick in range(0, ticks, chunk_ticks)]
+
+            price_path = os.path.join(out_folder, "prices_round_" + str(round_number) + "_day_" + str(day) + ".csv")
+            trade_path = os.path.join(out_folder, "trades_round_" + str(round_number) + "_day_" + str(day) + "_nn.csv")
+            with open(price_path, "wb") as price_file, open(trade_path, "wb") as trade_file:
+                price_file.write((PRICE_HEADER + "\n").encode())
+                trade_file.write((TRADE_HEADER + "\n").encode())
+                for price_bytes, trade_bytes in (pool.map(chunk_lines, tasks) if pool is not None else map(chunk_lines, tasks)):
+                    price_file.write(price_bytes)
+                    trade_file.write(trade_bytes)
+
+            paths.append((price_path, trade_path))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic prices/trades day files in the exchange format")
+    parser.add_argument("out_folder")
+    parser.add_argument("--days", type=int, nargs="+", default=[0])
+    parser.add_argument("--products", type=int, default=2)
+    parser.add_argument("--ticks", type=int, default=10000)
+    parser.add_argument("--depth", type=int, default=LEVELS, help="Book levels shown per side, at most " + str(LEVELS))
+    parser.add_argument("--volatility", default="normal", help="calm, normal, volatile, switching or a std per tick")
+    parser.add_argument("--trade-intensity", type=float, default=0.25, help="Mean trades per product and tick")
+    parser.add_argument("--round", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Formatting processes, all cores by default")
+    args = parser.parse_args()
+
+    volatility = args.volatility if args.volatility in VOLATILITY or args.volatility == "switching" else float(args.volatility)
+
+    start = time.perf_counter()
+    paths = generate(args.out_folder, args.days, args.products, args.ticks, args.depth, volatility,
+                     args.trade_intensity, args.round, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+
+    size = sum(os.path.getsize(path) for pair in paths for path in pair)
+    for price_path, trade_path in paths:
+        print(price_path, trade_path)
+    print(round(size / 1e6, 1), "MB in", round(elapsed, 2), "s")
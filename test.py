@@ -1,5 +1,5 @@
 from trader import Trader
-from datamodel import Listing, OrderDepth, Trade, TradingState
+from datamodel import Listing, Order, OrderDepth, Trade, TradingState
 
 timestamp = 1000
 
@@ -69,3 +69,136 @@ me = Trader()
 trades = me.run(state)
 
 print(trades)
+
+# The checks below replay day 0 and compare the batch and alternative code paths with the
+# per-tick ones they stand in for, tick by tick
+from data_loader import load_prices, load_trades
+from replay import replay
+from run_data import run_backtests
+from avellaneda import quote_batch
+import numpy as np
+
+data_folder = "round-1-island-data-bottle"
+price_path = data_folder + "/prices_round_1_day_0.csv"
+trade_path = data_folder + "/trades_round_1_day_0_nn.csv"
+day = [(load_prices(price_path), load_trades(trade_path))]
+
+# Keeps the AS parameters and orders of every deploy_AS call
+class RecordingTrader(Trader):
+	def __init__(self):
+		super().__init__()
+		self.quotes = []
+
+	def deploy_AS(self, AS_params, product_name, trading_state):
+		orders = super().deploy_AS(AS_params, product_name, trading_state)
+		self.quotes.append((AS_params, product_name, [(order.price, order.quantity) for order in orders]))
+		return orders
+
+# avellaneda.quote_batch gives deploy_AS's quotes
+recorder = RecordingTrader()
+run_backtests([recorder], replay(day))
+params = {name: np.array([AS_params[name] for AS_params, _, _ in recorder.quotes]) for name in ("s", "sigma", "t", "gamma", "kappa", "q")}
+limits = np.array([recorder.position_limit.get(product, recorder.default_position_limit) for _, product, _ in recorder.quotes])
+bid_price, ask_price, bid_volume, ask_volume = quote_batch(params["s"], params["sigma"], params["t"], params["gamma"], params["kappa"], params["q"], limits)
+expected = np.array([[bid[0], ask[0], bid[1], -ask[1]] for _, _, (bid, ask) in recorder.quotes])
+assert (np.stack([bid_price, ask_price, bid_volume, ask_volume], axis=1) == expected).all()
+print("quote_batch matches deploy_AS on", len(expected), "quotes")
+
+# fill_model.passive_fills_day gives the per-tick PassiveFillModel's fills for the quotes the replay rested
+from fill_model import PassiveFillModel, passive_fills_day
+from run_data import Backtest, mid_price
+from trade_tape import TradeTape
+
+class RecordingFills(PassiveFillModel):
+	def __init__(self):
+		super().__init__()
+		self.rested = []
+		self.filled = []
+
+	def rest(self, orders, order_depths):
+		super().rest(orders, order_depths)
+		self.rested.append(list(orders))
+
+	def fill(self, market_trades, engine, timestamp):
+		own_trades = super().fill(market_trades, engine, timestamp)
+		self.filled.append(own_trades)
+		return own_trades
+
+backtest = Backtest(Trader())
+backtest.fill_model = fills = RecordingFills()
+for replay_state in replay(day):
+	backtest.step(replay_state, {product: mid_price(order_depth) for product, order_depth in replay_state.order_depths.items()})
+
+# Quotes rested on tick i are filled on tick i + 1, the last tick's quotes never get the chance
+prices, trades = day[0]
+tape = TradeTape(trades)
+for product in prices.products:
+	quotes = np.zeros((len(fills.rested), 4))
+	quotes[:, [0, 2]] = np.nan
+	for i, orders in enumerate(fills.rested):
+		for order in orders:
+			if order.symbol == product:
+				side = 0 if order.quantity > 0 else 2
+				quotes[i, side:side + 2] = order.price, abs(order.quantity)
+
+	bid_fill, ask_fill = passive_fills_day(prices, tape, product, quotes[:, 0], quotes[:, 1], quotes[:, 2], quotes[:, 3])
+	tick_bid_fill = [sum(trade.quantity for trade in own_trades.get(product, []) if trade.buyer == "SUBMISSION") for own_trades in fills.filled[1:]]
+	tick_ask_fill = [sum(trade.quantity for trade in own_trades.get(product, []) if trade.seller == "SUBMISSION") for own_trades in fills.filled[1:]]
+	assert bid_fill[:-1].tolist() == tick_bid_fill and ask_fill[:-1].tolist() == tick_ask_fill
+	print("passive_fills_day matches PassiveFillModel for", product, "with", sum(tick_bid_fill) + sum(tick_ask_fill), "units filled")
+
+# fast_math (math module) and numpy quote the same on every tick
+fast, slow = RecordingTrader(), RecordingTrader()
+slow.fast_math = False
+run_backtests([fast, slow], replay(day))
+assert [orders for _, _, orders in fast.quotes] == [orders for _, _, orders in slow.quotes]
+print("fast_math matches numpy on", len(fast.quotes), "quotes")
+
+# LiveFeatures computed inside the tick loop give the cached FeatureTable's values
+from features import LiveFeatures, load_features
+import math
+
+table = load_features(price_path, trade_path)
+live = LiveFeatures()
+compared = 0
+for replay_state in replay(day):
+	for product, order_depth in replay_state.order_depths.items():
+		expected = table.at(product, replay_state.timestamp)
+		computed = live.update(product, order_depth, replay_state.market_trades.get(product), replay_state.timestamp)
+		for name, value in expected.items():
+			assert math.isclose(computed[name], value, rel_tol=1e-9, abs_tol=1e-9) or (math.isnan(computed[name]) and math.isnan(value)), (product, replay_state.timestamp, name)
+		compared += 1
+print("LiveFeatures matches the feature table on", compared, "product ticks")
+
+# trader.choose_conversion (scalar, inside the uploaded file) picks the same conversion as
+# conversion.py's numpy scoring, on random books and observations
+from trader import choose_conversion
+from datamodel import ConversionObservation
+from conversion import conversion_edges, best_conversions
+import random
+
+rng = random.Random(0)
+for _ in range(2000):
+	levels = rng.randint(0, 3)
+	bids = sorted(rng.sample(range(1090, 1100), levels), reverse=True)
+	asks = sorted(rng.sample(range(1101, 1111), rng.randint(0, 3)))
+	buy_orders = {price: rng.randint(1, 15) for price in bids}
+	sell_orders = {price: -rng.randint(1, 15) for price in asks}
+	observation = ConversionObservation(rng.uniform(1085, 1105), rng.uniform(1095, 1115), rng.uniform(0, 2), rng.uniform(0, 3), rng.uniform(-3, 2), 0, 0)
+	position = rng.randint(-100, 100)
+
+	sizes, edges = conversion_edges(observation.bidPrice, observation.askPrice, observation.transportFees, observation.exportTariff, observation.importTariff,
+									bids or [np.nan], [buy_orders[price] for price in bids] or [0], asks or [np.nan], [-sell_orders[price] for price in asks] or [0], 100)
+	expected, _ = best_conversions(sizes, edges, position)
+	assert choose_conversion(observation, OrderDepth(buy_orders, sell_orders), position, 100) == int(expected), (buy_orders, sell_orders, position)
+print("choose_conversion matches conversion.py on 2000 random books")
+
+# A book level showing volume 0 (the data has them, e.g. day -2 ts 536800) is skipped by matching
+from matching import MatchingEngine
+
+engine = MatchingEngine()
+engine.load({"AMETHYSTS": OrderDepth(buy_orders={9998: 0, 9996: 2}, sell_orders={10002: 0, 10004: -3})}, 100)
+own_trades = engine.match_orders({"AMETHYSTS": [Order("AMETHYSTS", 9990, -1), Order("AMETHYSTS", 10010, 1)]})
+assert [(trade.price, trade.quantity) for trade in own_trades["AMETHYSTS"]] == [(9996, 1), (10004, 1)]
+assert engine.position["AMETHYSTS"] == 0
+print("matching skips zero volume levels")
@@ -0,0 +1,223 @@
+from datamodel import Order, Symbol, Trade, TradingState
+from book import levels_of
+from typing import Dict, List
+from array import array
+import json
+import struct
+import sys
+import numpy as np
+
+
+# Kinds of the blocks in a binary log
+BOOKS = 0
+MARKET = 1
+ORDERS = 2
+FILLS = 3
+NAMES = 4
+
+# Values per record of the fixed width kinds
+MARKET_FIELDS = ("timestamp", "product", "price", "quantity", "buyer", "seller")
+ORDER_FIELDS = ("timestamp", "product", "price", "quantity")
+WIDTHS = {MARKET: len(MARKET_FIELDS), ORDERS: len(ORDER_FIELDS), FILLS: len(MARKET_FIELDS)}
+
+BLOCK_HEADER = struct.Struct("<qq")
+
+
+# Buffered logger for replay ticks, written as binary records of float64 values:
+#   book:         timestamp, product, bid levels, ask levels, bid prices, bid volumes, ask prices, ask volumes
+#                 (best first, ask volumes positive, so a record is 4 + 2 * (bid levels + ask levels) long)
+#   market trade: timestamp, product, price, quantity, buyer, seller
+#   our order:    timestamp, product, price, quantity
+#   our fill:     timestamp, product, price, quantity, buyer, seller
+# Products and trader names are stored as codes into one name table.
+# log() copies the numbers into one list per kind, so a tick costs a few appends and nothing is
+# formatted; every buffer_size ticks each list goes to the file as one block (kind, length, values),
+# preceded by a NAMES block (JSON) when new names came up. read_log() reads the file back,
+# python trade_logger.py log.bin prints it as text.
+# With visualizer=True every tick is written as one line of the visualizer's JSON format instead,
+# formatted straight away since it includes the live position dict. That costs about as much as
+# TradingState.toJSON, use it for runs meant for the visualizer only.
+class TradeLogger:
+    def __init__(self, path: str, buffer_size: int = 1000, visualizer: bool = False) -> None:
+        self.path = path
+        self.buffer_size = buffer_size
+        self.visualizer = visualizer
+        self.buffer = []
+        self.ticks = 0
+        self.blocks = {kind: [] for kind in (BOOKS, MARKET, ORDERS, FILLS)}
+        self.codes = {}
+        self.names = []
+        self.written_names = 0
+        self.file = open(path, "w" if visualizer else "wb")
+
+    def code(self, name) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def log(self, state: TradingState, orders: Dict[Symbol, List[Order]], fills: Dict[Symbol, List[Trade]] = None,
+            conversions: int = 0, trader_data: str = ""):
+        if self.visualizer:
+            self.buffer.append(visualizer_line(state, orders, conversions, trader_data))
+            if len(self.buffer) >= self.buffer_size:
+                self.flush()
+            return
+
+        timestamp = state.timestamp
+        codes = self.codes
+        code = self.code
+
+        # Plain lists take the numbers, they only become doubles in flush
+        books = self.blocks[BOOKS]
+        for product, order_depth in state.order_depths.items():
+            bid_prices, bid_volumes, ask_prices, ask_volumes = levels_of(order_depth)
+            books += (timestamp, codes[product] if product in codes else code(product), len(bid_prices), len(ask_prices))
+            books += bid_prices
+            books += bid_volumes
+            books += ask_prices
+            books += ask_volumes
+
+        market = self.blocks[MARKET]
+        for product, trades in state.market_trades.items():
+            for trade in trades:
+                market += (trade.timestamp, code(product), trade.price, trade.quantity, code(trade.buyer or ""), code(trade.seller or ""))
+
+        block = self.blocks[ORDERS]
+        for product, product_orders in orders.items():
+            product_code = codes[product] if product in codes else code(product)
+            for order in product_orders:
+                block += (timestamp, product_code, order.price, order.quantity)
+
+        if fills:
+            block = self.blocks[FILLS]
+            for product, trades in fills.items():
+                for trade in trades:
+                    block += (trade.timestamp, code(product), trade.price, trade.quantity, code(trade.buyer or ""), code(trade.seller or ""))
+
+        self.ticks += 1
+        if self.ticks >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.visualizer:
+            if self.buffer:
+                self.file.write("\n".join(self.buffer))
+                self.file.write("\n")
+                self.buffer = []
+            return
+
+        if len(self.names) > self.written_names:
+            names = json.dumps(self.names[self.written_names:]).encode()
+            self.file.write(BLOCK_HEADER.pack(NAMES, len(names)))
+            self.file.write(names)
+            self.written_names = len(self.names)
+
+        for kind, values in self.blocks.items():
+            if values:
+                self.file.write(BLOCK_HEADER.pack(kind, len(values)))
+                self.file.write(array("d", values).tobytes())
+                self.blocks[kind] = []
+        self.ticks = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+# A binary log as {"names", "books", "market", "orders", "fills"}: books as a list of
+# (timestamp, product, bid prices, bid volumes, ask prices, ask volumes), the other kinds as
+# (records, fields) arrays in MARKET_FIELDS / ORDER_FIELDS order, products and traders as codes into names
+def read_log(path: str) -> dict:
+    names = []
+    values = {kind: [] for kind in (BOOKS, MARKET, ORDERS, FILLS)}
+    with open(path, "rb") as file:
+        data = file.read()
+
+    position = 0
+    while position < len(data):
+        kind, length = BLOCK_HEADER.unpack_from(data, position)
+        position += BLOCK_HEADER.size
+        if kind == NAMES:
+            names += json.loads(data[position:position + length])
+            position += length
+        else:
+            values[kind].append(np.frombuffer(data, dtype="<f8", count=length, offset=position))
+            position += length * 8
+
+    log = {"names": names, "books": []}
+    if values[BOOKS]:
+        book_values = np.concatenate(values[BOOKS]).tolist()
+        i = 0
+        while i < len(book_values):
+            timestamp, product, bids, asks = (int(value) for value in book_values[i:i + 4])
+            i += 4
+            levels = [book_values[i:i + bids], book_values[i + bids:i + 2 * bids],
+                      book_values[i + 2 * bids:i + 2 * bids + asks], book_values[i + 2 * bids + asks:i + 2 * bids + 2 * asks]]
+            i += 2 * (bids + asks)
+            log["books"].append((timestamp, product, *levels))
+
+    for kind, name in ((MARKET, "market"), (ORDERS, "orders"), (FILLS, "fills")):
+        flat = np.concatenate(values[kind]) if values[kind] else np.zeros(0)
+        log[name] = flat.reshape(-1, WIDTHS[kind])
+    return log
+
+
+def number(value: float) -> str:
+    return str(int(value)) if value == int(value) else str(value)
+
+
+# A binary log as text, one ';' separated record per line, grouped by kind and in logged order within a kind:
+#   B;timestamp;product;bid prices;bid volumes;ask prices;ask volumes   (','-joined)
+#   M;timestamp;product;price;quantity;buyer;seller                    (market trade)
+#   O;timestamp;product;price;quantity                                 (our order)
+#   F;timestamp;product;price;quantity;buyer;seller                    (our fill)
+def text_records(log: dict):
+    names = log["names"]
+    for timestamp, product, *levels in log["books"]:
+        yield "B;" + str(timestamp) + ";" + names[product] + ";" + ";".join(",".join(map(number, side)) for side in levels)
+    for kind, name in (("M", "market"), ("O", "orders"), ("F", "fills")):
+        for record in log[name].tolist():
+            fields = [number(record[0]), names[int(record[1])]] + [number(value) for value in record[2:4]]
+            fields += [names[int(code)] for code in record[4:]]
+            yield kind + ";" + ";".join(fields)
+
+
+def compress_trades(trades: Dict[Symbol, List[Trade]]):
+    return [[trade.symbol, trade.price, trade.quantity, trade.buyer, trade.seller, trade.timestamp]
+            for product_trades in trades.values() for trade in product_trades]
+
+
+# One tick in the JSON layout the Prosperity visualizer reads:
+# [state, orders, conversions, traderData, logs] with every object flattened to lists
+def visualizer_line(state: TradingState, orders: Dict[Symbol, List[Order]], conversions: int, trader_data: str, logs: str = "") -> str:
+    observations = state.observations
+    if not hasattr(observations, "conversionObservations"):
+        compressed_observations = [{}, {}]
+    else:
+        compressed_observations = [
+            observations.plainValueObservations,
+            {product: [observation.bidPrice, observation.askPrice, observation.transportFees, observation.exportTariff,
+                       observation.importTariff, observation.sunlight, observation.humidity]
+             for product, observation in observations.conversionObservations.items()},
+        ]
+
+    compressed_state = [
+        state.timestamp,
+        state.traderData,
+        [[listing.symbol, listing.product, listing.denomination] for listing in state.listings.values()],
+        {product: [order_depth.buy_orders, order_depth.sell_orders] for product, order_depth in state.order_depths.items()},
+        compress_trades(state.own_trades),
+        compress_trades(state.market_trades),
+        state.position,
+        compressed_observations,
+    ]
+    compressed_orders = [[order.symbol, order.price, order.quantity] for product_orders in orders.values() for order in product_orders]
+
+    return json.dumps([compressed_state, compressed_orders, conversions, trader_data, logs], separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    for line in text_records(read_log(sys.argv[1])):
+        print(line)
@@ -0,0 +1,79 @@
+from datamodel import Trade
+from data_loader import TradeData
+from typing import List
+import numpy as np
+
+
+# Market trades split per product and sorted by timestamp, with running sums for O(1) VWAP.
+# All range queries cover (start, end], found with np.searchsorted in O(log n).
+class TradeTape:
+    def __init__(self, trades: TradeData, offset: int = 0) -> None:
+        self.traders = trades.traders
+        self.timestamp = {}
+        self.price = {}
+        self.quantity = {}
+        self.buyer = {}
+        self.seller = {}
+        self.notional_sum = {}
+        self.quantity_sum = {}
+
+        for code, product in enumerate(trades.products):
+            rows = np.flatnonzero(trades.symbol == code)
+            rows = rows[np.argsort(trades.timestamp[rows], kind="stable")]
+
+            self.timestamp[product] = trades.timestamp[rows] + offset
+            self.price[product] = trades.price[rows]
+            self.quantity[product] = trades.quantity[rows]
+            self.buyer[product] = trades.buyer[rows]
+            self.seller[product] = trades.seller[rows]
+
+            # Prefix sums with a leading 0 so a range sum is sum[hi] - sum[lo]
+            self.notional_sum[product] = np.concatenate(([0.0], np.cumsum(self.price[product] * self.quantity[product])))
+            self.quantity_sum[product] = np.concatenate(([0], np.cumsum(self.quantity[product])))
+
+    @property
+    def products(self):
+        return list(self.timestamp)
+
+    # Index range [lo, hi) of a product's trades with start < timestamp <= end
+    def range(self, product: str, start: int, end: int):
+        timestamp = self.timestamp.get(product)
+        if timestamp is None:
+            return 0, 0
+        lo = int(np.searchsorted(timestamp, start, side="right"))
+        hi = int(np.searchsorted(timestamp, end, side="right"))
+        return lo, max(lo, hi)
+
+    def trades(self, product: str, start: int, end: int) -> List[Trade]:
+        lo, hi = self.range(product, start, end)
+        if lo == hi:
+            return []
+
+        traders = self.traders
+        return [
+            Trade(product, price, quantity, traders[buyer], traders[seller], timestamp)
+            for timestamp, price, quantity, buyer, seller in zip(
+                self.timestamp[product][lo:hi].tolist(), self.price[product][lo:hi].tolist(),
+                self.quantity[product][lo:hi].tolist(), self.buyer[product][lo:hi].tolist(),
+                self.seller[product][lo:hi].tolist())
+        ]
+
+    def volume(self, product: str, start: int, end: int) -> int:
+        lo, hi = self.range(product, start, end)
+        if lo == hi:
+            return 0
+        quantity_sum = self.quantity_sum[product]
+        return int(quantity_sum[hi] - quantity_sum[lo])
+
+    # Volume weighted average trade price over (start, end], None without trades
+    def vwap(self, product: str, start: int, end: int):
+        lo, hi = self.range(product, start, end)
+        if lo == hi:
+            return None
+        notional_sum = self.notional_sum[product]
+        quantity_sum = self.quantity_sum[product]
+        return float((notional_sum[hi] - notional_sum[lo]) / (quantity_sum[hi] - quantity_sum[lo]))
+
+    # VWAP of the trailing window (timestamp - window, timestamp], e.g. window = 20 * 100 for the last 20 ticks
+    def trailing_vwap(self, product: str, timestamp: int, window: int):
+        return self.vwap(product, timestamp - window, timestamp)
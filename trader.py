@@ -1,10 +1,271 @@
 from datamodel import OrderDepth, UserId, TradingState, Order
 from typing import List
 import string
-import numpy as np
+import math
+import time
+from collections import deque
+import base64
+import json
+import os
+import struct
+
+
+# Standard deviation over all values seen so far (Welford's algorithm).
+# Matches np.std (population std) of the full history in O(1) time and memory per update.
+class RunningStd:
+    def __init__(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x: float) -> float:
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        return self.std()
+
+    def std(self) -> float:
+        if self.n == 0:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / self.n)
+
+    # Internal state as a flat list of floats, used to persist the estimator in traderData.
+    # history_limit only matters to WindowStd.
+    def state(self, history_limit: int = None):
+        return [self.n, self.mean, self.m2]
+
+    def restore(self, values):
+        self.n = int(values[0])
+        self.mean = values[1]
+        self.m2 = values[2]
+
+
+# Standard deviation over the last `window` values.
+# Values are added and removed with Welford updates, only the window itself is stored.
+class WindowStd:
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x: float) -> float:
+        if len(self.values) == self.window:
+            old = self.values.popleft()
+            n = len(self.values)
+            if n == 0:
+                self.mean = 0.0
+                self.m2 = 0.0
+            else:
+                delta = old - self.mean
+                self.mean -= delta / n
+                self.m2 -= delta * (old - self.mean)
+
+        self.values.append(x)
+        delta = x - self.mean
+        self.mean += delta / len(self.values)
+        self.m2 += delta * (x - self.mean)
+        return self.std()
+
+    def std(self) -> float:
+        if not self.values:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / len(self.values))
+
+    # At most the last history_limit values are kept, with the mean and m2 of just those, so the
+    # payload stays bounded however long the window. A restored estimator fills up to its window again.
+    def state(self, history_limit: int = None):
+        if history_limit is None or len(self.values) <= history_limit:
+            return [self.window, self.mean, self.m2] + list(self.values)
+
+        values = list(self.values)[len(self.values) - history_limit:]
+        mean = sum(values) / len(values) if values else 0.0
+        m2 = sum((value - mean) ** 2 for value in values)
+        return [self.window, mean, m2] + values
+
+    def restore(self, values):
+        self.window = int(values[0])
+        self.mean = values[1]
+        self.m2 = values[2]
+        self.values = deque(values[3:])
+
+
+# Exponentially weighted standard deviation, each update weights the new value by `alpha`
+class EwmaStd:
+    def __init__(self, alpha: float) -> None:
+        self.alpha = alpha
+        self.n = 0
+        self.mean = 0.0
+        self.var = 0.0
+
+    def update(self, x: float) -> float:
+        self.n += 1
+        if self.n == 1:
+            self.mean = x
+            self.var = 0.0
+        else:
+            delta = x - self.mean
+            self.mean += self.alpha * delta
+            self.var = (1 - self.alpha) * (self.var + self.alpha * delta * delta)
+        return self.std()
+
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+    def state(self, history_limit: int = None):
+        return [self.alpha, self.n, self.mean, self.var]
+
+    def restore(self, values):
+        self.alpha = values[0]
+        self.n = int(values[1])
+        self.mean = values[2]
+        self.var = values[3]
+
+
+# Build an estimator from a mode name: "all", "window" or "ewma"
+def make_estimator(mode: str = "all", window: int = 100, alpha: float = 0.05):
+    if mode == "all":
+        return RunningStd()
+    if mode == "window":
+        return WindowStd(window)
+    if mode == "ewma":
+        return EwmaStd(alpha)
+    raise ValueError("Unknown volatility mode: " + str(mode))
+
+
+# Bump whenever the calibration table layout or the meaning of a fitted value changes, other versions are ignored
+CALIBRATION_VERSION = 2
+
+# traderData layout version, payloads of other versions are ignored
+STATE_VERSION = 1
+
+# Estimator classes by the code stored in traderData
+ESTIMATORS = [RunningStd, WindowStd, EwmaStd]
+NO_ESTIMATOR = -1
+
+# traderData is kept under MAX_TRADER_DATA characters. A "window" estimator stores at most
+# STATE_HISTORY_LIMIT of its ratios (about 11 KB per product), fewer if all products don't fit otherwise.
+MAX_TRADER_DATA = 50000
+STATE_HISTORY_LIMIT = 1000
+
+
+# Pack the Trader's rolling state into traderData.
+# Layout: "<version>|<product>,<product>,...|<base64 of little endian doubles>" where the doubles are
+# last_timestamp, then per product: last_avg_trade_price, estimator code, state length, estimator state.
+# Window histories are halved until the payload fits in MAX_TRADER_DATA.
+def encode_state(trader, history_limit: int = STATE_HISTORY_LIMIT) -> str:
+    products = list(trader.last_avg_trade_price)
+    for product in trader.volatility:
+        if product not in trader.last_avg_trade_price:
+            products.append(product)
+
+    values = [trader.last_timestamp]
+    for product in products:
+        values.append(trader.last_avg_trade_price.get(product, 0))
+
+        estimator = trader.volatility.get(product)
+        if estimator is None:
+            values += [NO_ESTIMATOR, 0]
+        else:
+            state = estimator.state(history_limit)
+            values += [ESTIMATORS.index(type(estimator)), len(state)]
+            values += state
+
+    payload = base64.b64encode(struct.pack("<%dd" % len(values), *values)).decode("ascii")
+    data = str(STATE_VERSION) + "|" + ",".join(products) + "|" + payload
+    if len(data) > MAX_TRADER_DATA and history_limit > 0:
+        return encode_state(trader, history_limit // 2)
+    return data
+
+
+# Restore the Trader's rolling state from traderData.
+# Returns False (and leaves the trader untouched) if the data is empty or from another version.
+def decode_state(trader, data: str) -> bool:
+    parts = data.split("|", 2) if data else []
+    if len(parts) != 3 or parts[0] != str(STATE_VERSION):
+        return False
+
+    products = parts[1].split(",") if parts[1] else []
+    raw = base64.b64decode(parts[2])
+    values = struct.unpack("<%dd" % (len(raw) // 8), raw)
+
+    last_timestamp = int(values[0])
+    last_avg_trade_price = {}
+    volatility = {}
+
+    i = 1
+    for product in products:
+        last_avg_trade_price[product] = values[i]
+        code = int(values[i + 1])
+        length = int(values[i + 2])
+        i += 3
+
+        if code != NO_ESTIMATOR:
+            estimator = ESTIMATORS[code].__new__(ESTIMATORS[code])
+            estimator.restore(list(values[i:i + length]))
+            volatility[product] = estimator
+        i += length
+
+    trader.last_timestamp = last_timestamp
+    trader.last_avg_trade_price.update(last_avg_trade_price)
+    trader.volatility = volatility
+    return True
+
+
+# Price paid (asks) or received (bids) for 1..units units taken from book levels best first,
+# units past the displayed depth at the last level's price. Levels are (price, volume), volume > 0.
+def walk_levels(levels, units):
+    totals = []
+    total = 0
+    for price, volume in levels:
+        for _ in range(min(volume, units - len(totals))):
+            total += price
+            totals.append(total)
+    while len(totals) < units:
+        total += levels[-1][0]
+        totals.append(total)
+    return totals
+
+
+# Conversion count for the convertible product on this tick: the size with the highest positive edge
+# over closing the same units in the local book, among those that only reduce the position.
+#   c > 0 buys c units abroad at askPrice + transportFees + importTariff (edge: local cost - import cost)
+#   c < 0 sells -c units abroad at bidPrice - transportFees - exportTariff (edge: export revenue - local revenue)
+# At most position_limit sizes per side, so a plain loop is enough. conversion.py scores whole days
+# the same way with numpy, ties go to the same size.
+def choose_conversion(observation, order_depth: OrderDepth, position: int, position_limit: int) -> int:
+    if position == 0:
+        return 0
+
+    units = min(abs(position), position_limit)
+    if position < 0:
+        levels = sorted((price, -volume) for price, volume in order_depth.sell_orders.items() if volume < 0)
+        unit_price = observation.askPrice + observation.transportFees + observation.importTariff
+    else:
+        levels = sorted(((price, volume) for price, volume in order_depth.buy_orders.items() if volume > 0), reverse=True)
+        unit_price = observation.bidPrice - observation.transportFees - observation.exportTariff
+    if not levels or units == 0:
+        return 0
+
+    best = 0
+    best_edge = 0
+    for size, local in enumerate(walk_levels(levels, units), 1):
+        if position < 0:
+            edge = local - size * unit_price
+            # Smallest import wins a tie
+            if edge > best_edge:
+                best, best_edge = size, edge
+        else:
+            edge = size * unit_price - local
+            # Largest export wins a tie
+            if edge > 0 and edge >= best_edge:
+                best, best_edge = -size, edge
+    return best
+
 
 class Trader:
-    def __init__(self) -> None:
+    def __init__(self, calibration_file: str = None) -> None:
         # Risk factor for each product, pre-set
         self.gamma = {
             "AMETHYSTS" : 1,
@@ -12,9 +273,18 @@ class Trader:
             "PRODUCT1"  : 5,
             "PRODUCT2"  : 5,
         }
+        # Products not listed above (e.g. synthetic ones) use these
+        self.default_gamma = 1
+        self.default_position_limit = 20
 
-        # Used to store the past trade price ratio to the previous timestamp => calculate Market volatility
-        self.past_trade_ratio = []
+        # Streaming std of the trade price ratio to the previous timestamp => calculate Market volatility
+        # Mode is "all" (whole history), "window" (last volatility_window ratios) or "ewma" (decay volatility_alpha)
+        self.volatility_mode = "all"
+        self.volatility_window = 100
+        self.volatility_alpha = 0.05
+
+        # One estimator per product, created on first use
+        self.volatility = {}
 
         # The initial trade price
         # TODO: What should we set
@@ -30,16 +300,84 @@ class Trader:
         # Initial last timestamp
         self.last_timestamp = 0
 
+        # traderData we returned last time, if the exchange hands it back unchanged our state is still in memory
+        self.last_trader_data = ""
+
+        # Optional latency.Profiler recording per phase/product timings, None turns profiling off
+        self.profiler = None
+
+        # Per-call time limit in seconds (None disables the guard). Once a call has used
+        # budget_fraction of it, the remaining products get cheap quotes instead of the full AS model.
+        self.time_budget = None
+        self.budget_fraction = 0.5
+
+        # Scalar math kernels from the math module. Off, deploy_AS goes through numpy instead,
+        # imported on first use so a fast_math Trader never pays for loading it. Both quote the same.
+        self.fast_math = True
+
+        # Optional per-tick book features (see features.py): a FeatureTable precomputed for the replayed
+        # days, or LiveFeatures computing them inside run. Off (None) by default.
+        # The current tick's values per product end up in book_features.
+        self.features = None
+        self.book_features = {}
+
+        # Book per product kept up to date in place from the replay's book deltas (on_book_deltas):
+        # {product: ({bid price: volume}, {ask price: volume})}, volumes positive. It holds the previous
+        # level volumes order_flow is measured against.
+        # order_flow is the last update's bid volume added minus ask volume added, a cheap order-flow signal.
+        # run hands it on as book_features[product]["order_flow"], the AS quotes don't use it.
+        self.books = {}
+        self.order_flow = {}
+
+        # The product conversions apply to
+        self.conversion_product = "ORCHIDS"
+
         # Position Limit for each product
         self.position_limit = {
             "AMETHYSTS" : 20,
             "STARFRUIT" : 20,
             "PRODUCT1"  : 20,
             "PRODUCT2"  : 20,
+            "ORCHIDS"   : 100,
         }
 
+        # Offline fitted sigma/kappa/gamma per product (see calibration.py), used instead of the
+        # per-tick estimates for the products it covers. Off unless a table is given, e.g.
+        # Trader("calibration.json"). Local replays call on_day so walk-forward tables switch per day.
+        self.calibration_file = calibration_file
+        self.calibration = self.load_calibration(calibration_file) if calibration_file is not None else {}
+
+    # Read a calibration table. With a day, a walk-forward table gives the entry fitted on the days
+    # before it, its latest fit after the last fitted day and nothing before (no look-ahead).
+    def load_calibration(self, path, day=None):
+        if not os.path.exists(path):
+            return {}
+
+        with open(path, "r") as file:
+            table = json.load(file)
+
+        if table.get("version") != CALIBRATION_VERSION:
+            return {}
+
+        if day is not None and "walk_forward" in table:
+            if str(day) in table["walk_forward"]:
+                return table["walk_forward"][str(day)]
+            if day <= max(table["days"]):
+                return {}
+        return table.get("products", {})
+
+    # Called by the local replay when a new day starts
+    def on_day(self, day):
+        if self.calibration_file is not None:
+            self.calibration = self.load_calibration(self.calibration_file, day)
+
     # Get the mid price for the orderbook
     def mid_price(self, order_book: OrderDepth):
+        # Books built by the local replay cache their mid price
+        mid = getattr(order_book, "mid", None)
+        if mid is not None:
+            return mid
+
         max_bid = None
         min_ask = None
 
@@ -73,6 +411,9 @@ class Trader:
     
     # Get total market volumn
     def total_volumn(self, order_book: OrderDepth):
+        if hasattr(order_book, "total_volume"):
+            return order_book.total_volume
+
         vol = 0
 
         for bid_price in order_book.buy_orders:
@@ -83,6 +424,21 @@ class Trader:
 
         return vol
 
+    # Get the volatility estimator of a product
+    def volatility_estimator(self, product_name):
+        if product_name not in self.volatility:
+            self.volatility[product_name] = make_estimator(self.volatility_mode, self.volatility_window, self.volatility_alpha)
+        return self.volatility[product_name]
+
+    # Feed this tick's trade price ratio into the product's volatility estimator and return sigma
+    def update_volatility(self, product_name, trading_state: TradingState):
+        trade_data = trading_state.market_trades[product_name] if product_name in trading_state.market_trades else []
+        cur_avg_trade_price = self.avg_trade_price(trade_data)
+        last_avg_trade_price = self.last_avg_trade_price.get(product_name, 0)
+        R_cur = (cur_avg_trade_price / last_avg_trade_price) if last_avg_trade_price > 0 else 1
+        self.last_avg_trade_price[product_name] = cur_avg_trade_price
+        return self.volatility_estimator(product_name).update(R_cur)
+
     # Calculate all AS parameters and return a hashmap for it
     def calc_AS_params(self, product_name, trading_state: TradingState):
         params = {}
@@ -91,15 +447,21 @@ class Trader:
         order_book = trading_state.order_depths[product_name]
         params["s"] = self.mid_price(order_book)
 
-        # Market volatility(σ)
-        trade_data = trading_state.market_trades[product_name] if product_name in trading_state.market_trades else []
-        cur_avg_trade_price = self.avg_trade_price(trade_data)
-        R_cur = (cur_avg_trade_price / self.last_avg_trade_price[product_name]) if self.last_avg_trade_price[product_name] > 0 else 1
-        self.past_trade_ratio.append(R_cur)
+        # Calibrated products skip the per-tick estimation
+        if product_name in self.calibration:
+            calibrated = self.calibration[product_name]
+            params["sigma"] = calibrated["sigma"]
+            params["T"] = 1
+            params["t"] = trading_state.timestamp / self.max_timestamp
+            params["gamma"] = calibrated["gamma"]
+            params["kappa"] = calibrated["kappa"]
+            params["q"] = trading_state.position[product_name] if product_name in trading_state.position else 0
+            self.last_timestamp = trading_state.timestamp
+            return params
 
-        params["sigma"] = np.std(self.past_trade_ratio)
+        # Market volatility(σ)
+        params["sigma"] = self.update_volatility(product_name, trading_state)
         # print(params["sigma"])
-        self.last_avg_trade_price[product_name] = cur_avg_trade_price
 
         # Normalized closing time(T)
         params["T"] = 1
@@ -108,7 +470,7 @@ class Trader:
         params["t"] = trading_state.timestamp / self.max_timestamp
 
         # Risk Factor (γ)
-        params["gamma"] = self.gamma[product_name]
+        params["gamma"] = self.gamma.get(product_name, self.default_gamma)
 
         # Order Book Depth (κ)
         time_diff = trading_state.timestamp - self.last_timestamp
@@ -140,7 +502,11 @@ class Trader:
         r = s - q * gamma * sigma * sigma * (T - t)
 
         # Optimal bid/ask spread
-        delta = (gamma * sigma * sigma * (T - t) + 2 * np.log(1 + gamma / kappa) / gamma) / 2
+        if self.fast_math:
+            delta = (gamma * sigma * sigma * (T - t) + 2 * math.log(1 + gamma / kappa) / gamma) / 2
+        else:
+            import numpy as np
+            delta = (gamma * sigma * sigma * (T - t) + 2 * np.log(1 + gamma / kappa) / gamma) / 2
 
         # Trade Price
         bid_price = int(r - delta)
@@ -148,14 +514,58 @@ class Trader:
 
         # Trade Volumn
         position = trading_state.position[product_name] if product_name in trading_state.position else 0
-        bid_volume = self.position_limit[product_name] - position
-        ask_volume = position + self.position_limit[product_name]
+        position_limit = self.position_limit.get(product_name, self.default_position_limit)
+        bid_volume = position_limit - position
+        ask_volume = position + position_limit
 
         trades.append(Order(product_name, bid_price, bid_volume))
         trades.append(Order(product_name, ask_price, -ask_volume))
         # print("For product ", product_name, "r and delta is", r, delta)
         return trades
     
+    # Quote one tick either side of the mid price, used when a call is running out of time
+    def cheap_quote(self, product_name, trading_state: TradingState):
+        s = self.mid_price(trading_state.order_depths[product_name])
+        position = trading_state.position[product_name] if product_name in trading_state.position else 0
+        position_limit = self.position_limit.get(product_name, self.default_position_limit)
+        bid_volume = position_limit - position
+        ask_volume = position + position_limit
+
+        return [Order(product_name, int(s) - 1, bid_volume), Order(product_name, int(s) + 1, -ask_volume)]
+
+    # Apply the (side, price, new volume) level changes since the last snapshot, side 0 bid / 1 ask
+    # Products missing from deltas didn't change, their flow is 0.
+    def on_book_deltas(self, timestamp, deltas):
+        for product in self.order_flow:
+            self.order_flow[product] = 0
+        for product, product_deltas in deltas.items():
+            book = self.books.setdefault(product, ({}, {}))
+            flow = 0
+            for side, price, volume in product_deltas:
+                levels = book[side]
+                change = volume - levels.get(price, 0)
+                if volume:
+                    levels[price] = volume
+                else:
+                    levels.pop(price, None)
+                flow += change if side == 0 else -change
+            self.order_flow[product] = flow
+
+    # Conversion count for this tick, the best edge over closing the position locally (see choose_conversion).
+    # The exchange applies the single count to the convertible product, so only its observation counts.
+    def conversions(self, state: TradingState):
+        observations = getattr(state.observations, "conversionObservations", None)
+        if not observations:
+            return 0
+
+        product = self.conversion_product
+        if product not in observations or product not in state.order_depths:
+            return 0
+
+        position = state.position[product] if product in state.position else 0
+        return choose_conversion(observations[product], state.order_depths[product], position,
+                                 self.position_limit.get(product, self.default_position_limit))
+
     def print_state(self, state: TradingState):
         print("----- STATE -----")
         print("Time:", state.timestamp)
@@ -179,14 +589,61 @@ class Trader:
         # self.print_state(state)
         result = {}
 
-        for product in state.order_depths:
-            product_params = self.calc_AS_params(product, state)
+        # Restore the rolling state in case this instance didn't survive since the last call
+        if state.traderData and state.traderData != self.last_trader_data:
+            decode_state(self, state.traderData)
+
+        profiler = self.profiler
+        deadline = None
+        if profiler is not None or self.time_budget is not None:
+            start = time.perf_counter()
+            if self.time_budget is not None:
+                deadline = start + self.time_budget * self.budget_fraction
+
+        if self.features is not None:
+            for product in state.order_depths:
+                self.book_features[product] = self.features.update(product, state.order_depths[product],
+                                                                   state.market_trades.get(product), state.timestamp)
+
+        if self.order_flow:
+            for product in state.order_depths:
+                features = self.book_features.get(product)
+                if features is None:
+                    features = self.book_features[product] = {}
+                features["order_flow"] = self.order_flow.get(product, 0)
 
-            trades = self.deploy_AS(product_params, product, state)
+        for product in state.order_depths:
+            if deadline is not None and time.perf_counter() > deadline:
+                result[product] = self.cheap_quote(product, state)
+                # Keep the rolling state moving so the next full model tick doesn't see stale ratios and kappa
+                if product not in self.calibration:
+                    self.update_volatility(product, state)
+                self.last_timestamp = state.timestamp
+                if profiler is not None:
+                    profiler.fallbacks += 1
+                continue
+
+            if profiler is None:
+                product_params = self.calc_AS_params(product, state)
+
+                trades = self.deploy_AS(product_params, product, state)
+            else:
+                phase_start = time.perf_counter()
+                product_params = self.calc_AS_params(product, state)
+                phase_mid = time.perf_counter()
+                trades = self.deploy_AS(product_params, product, state)
+                phase_end = time.perf_counter()
+
+                profiler.record("calc_AS_params", product, phase_mid - phase_start)
+                profiler.record("deploy_AS", product, phase_end - phase_mid)
 
             result[product] = trades  
     
-        traderData = "HAHA" # String value holding Trader state data required. It will be delivered as TradingState.traderData on next execution.
+        traderData = encode_state(self) # String value holding Trader state data required. It will be delivered as TradingState.traderData on next execution.
+        self.last_trader_data = traderData
+
+        if profiler is not None:
+            profiler.record("run", "ALL", time.perf_counter() - start)
         
-        conversions = 1
+        conversions = self.conversions(state)
         return result, conversions, traderData
\ No newline at end of file